@@ -0,0 +1,75 @@
+"""
+Time to get abilities ready, validated and compiled from their description or loaded from the ability cache.
+
+Generates a number of distinct abilities with create_object trees of several depths (copies of the test
+level's ability, each spawning the next) and reports the best time to parse and compile all of them and to
+load all of them with load_ability from a warm cache in a temporary directory. Run from the repository root:
+
+    python -m benchmarks.ability_cache [count]
+"""
+import copy
+import sys
+import tempfile
+import time
+from settings import settings
+from custom_event_engine import ability_cache
+from custom_event_engine.custom_event_engine import Ability, compile_program, program_cache_by_id, program_cache_by_content, unkeyed_programs, forget_models
+from custom_event_level_test.ability2 import ability_desc
+
+DEFAULT_COUNT = 300
+DEPTHS = (0, 2, 6)
+REPEATS = 5
+
+def make_ability(index, depth):
+    """A copy of ability_desc whose event object spawns a chain of depth more copies."""
+    ability = copy.deepcopy(ability_desc)
+    ability['event_object']['type'] = f'ABILITY_{index}'
+
+    parent = ability['event_object']
+    for level in range(depth):
+        child = copy.deepcopy(ability_desc['event_object'])
+        child['type'] = f'ABILITY_{index}_{level}'
+        parent['actions'][f'spawn_{level}'] = {'type': 'create_object', 'trigger': {'type': 'spawn'}, 'event_object': child, 'next': 'entry'}
+        parent = child
+
+    return ability
+
+def forget_compiled():
+    program_cache_by_id.clear()
+    program_cache_by_content.clear()
+    unkeyed_programs.clear()
+    forget_models()
+    ability_cache.loaded_abilities.clear()
+
+def parse_all(descriptions):
+    for description in descriptions:
+        compile_program(Ability.parse_obj(description).event_object)
+
+def load_all(descriptions):
+    for description in descriptions:
+        compile_program(ability_cache.load_ability(description).event_object)
+
+def best_time(function, descriptions):
+    best = float('inf')
+    for _ in range(REPEATS):
+        forget_compiled()
+        start = time.perf_counter()
+        function(descriptions)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(count=DEFAULT_COUNT):
+    with tempfile.TemporaryDirectory() as directory:
+        settings.ability_cache_dir = directory
+
+        print(f"{'depth':<8}{'count':>8}{'parse ms':>12}{'cached ms':>12}")
+        for depth in DEPTHS:
+            descriptions = [make_ability(index, depth) for index in range(count)]
+            load_all(descriptions)  # Fills the cache
+
+            parse_seconds = best_time(parse_all, descriptions)
+            load_seconds = best_time(load_all, descriptions)
+            print(f"{depth:<8}{count:>8}{parse_seconds * 1000:>12.0f}{load_seconds * 1000:>12.0f}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT)
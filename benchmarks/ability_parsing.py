@@ -0,0 +1,58 @@
+"""
+Parsing throughput of abilities in strict and trusted validation mode (settings.ability_validation).
+
+Parses and compiles a number of distinct abilities with create_object trees of several depths (see
+benchmarks/ability_cache.py), with everything compiled or validated before forgotten, and reports
+abilities per second:
+- cold: every description is new, and validated in both modes
+- warm: the same abilities again with their programs forgotten, as on a level restart, which trusted mode
+  takes from its memo of validated models
+
+Run from the repository root:
+
+    python -m benchmarks.ability_parsing [count]
+"""
+import sys
+import time
+from definitions import validation_modes
+from settings import settings
+from custom_event_engine.custom_event_engine import Ability, parse_model, compile_program, program_cache_by_id, program_cache_by_content, unkeyed_programs
+from benchmarks.ability_cache import make_ability, forget_compiled
+
+DEFAULT_COUNT = 200
+DEPTHS = (0, 2, 6)
+REPEATS = 3
+
+def parse_all(descriptions):
+    for description in descriptions:
+        compile_program(parse_model(Ability, description).event_object)
+
+def forget_programs():
+    program_cache_by_id.clear()
+    program_cache_by_content.clear()
+    unkeyed_programs.clear()
+
+def best_rate(descriptions, warm):
+    """Best abilities per second over REPEATS passes."""
+    best = float('inf')
+    for _ in range(REPEATS):
+        forget_compiled()
+        if warm:
+            parse_all(descriptions)
+            forget_programs()
+
+        start = time.perf_counter()
+        parse_all(descriptions)
+        best = min(best, time.perf_counter() - start)
+    return len(descriptions) / best
+
+def main(count=DEFAULT_COUNT):
+    print(f"{'mode':<10}{'depth':>6}{'cold /s':>12}{'warm /s':>12}")
+    for mode in (validation_modes.STRICT, validation_modes.TRUSTED):
+        settings.ability_validation = mode
+        for depth in DEPTHS:
+            descriptions = [make_ability(index, depth) for index in range(count)]
+            print(f"{mode:<10}{depth:>6}{best_rate(descriptions, False):>12.0f}{best_rate(descriptions, True):>12.0f}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT)
@@ -0,0 +1,60 @@
+"""
+Memory used by live game objects.
+
+Creates and registers a large number of particles and event objects and reports the bytes each one
+costs, measured with tracemalloc. Run from the repository root:
+
+    python -m benchmarks.memory [count]
+"""
+import gc
+import sys
+import tracemalloc
+from global_objects import globals
+from camera import Camera
+from collision import CollisionGrid
+from scheduler import FrameScheduler
+from dummy_objects.particle import Particle
+from custom_event_engine.custom_event_engine import Ability, CustomEventObject, compile_program
+from custom_event_level_test.ability1 import ability_desc
+
+DEFAULT_COUNT = 100000
+
+def measure(make, count):
+    """Return (bytes per object created, bytes per object once registered) for count objects."""
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+
+    objects = [make(i) for i in range(count)]
+    created = tracemalloc.get_traced_memory()[0]
+
+    for obj in objects:
+        obj.register()
+    registered = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    for obj in objects:
+        obj.unregister()
+
+    return (created - start) / count, (registered - start) / count
+
+def main(count=DEFAULT_COUNT):
+    globals.camera = Camera()
+    globals.collision_grid = CollisionGrid()
+    globals.scheduler = FrameScheduler()
+
+    program = compile_program(Ability.parse_obj(ability_desc).event_object)
+    origin = Particle(0, 0, 0, 0)
+
+    scenarios = [
+        ('Particle', lambda i: Particle(i % 128, i % 96, 1, 1)),
+        ('CustomEventObject', lambda i: CustomEventObject(program, origin)),
+    ]
+
+    print(f"{'object':<20}{'count':>10}{'bytes':>10}{'live bytes':>12}{'live MiB':>10}")
+    for name, make in scenarios:
+        created, registered = measure(make, count)
+        print(f"{name:<20}{count:>10}{created:>10.0f}{registered:>12.0f}{registered * count / 2 ** 20:>10.1f}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT)
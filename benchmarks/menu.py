@@ -0,0 +1,63 @@
+"""
+Time per frame of the main menu, next to a sparse game level.
+
+Draws the main menu and its settings submenu for a number of frames into an off-screen surface, idle
+and while typing into the text box, and reports the mean ms/frame of Menu.draw and the share of the
+screen it redraws, then the same for the dummy level (simulated and rendered). Run from the repository
+root:
+
+    python -m benchmarks.menu [frames]
+"""
+import sys
+import time
+import pygame
+import headless
+from headless import InputScript
+from settings import settings
+from general_objects.main_menu import MainMenu
+from dummy_objects.dummy_level import DummyLevel
+
+DEFAULT_FRAMES = 1000
+
+def typing_events(frame):
+    character = 'abcdefghijklmnopqrstuvwxyz '[frame % 27]
+    return [pygame.event.Event(pygame.KEYDOWN, key=ord(character), unicode=character, mod=0)]
+
+def measure_menu(menu, screen, frames, events_for=None):
+    """Return (mean ms per frame, mean share of the screen redrawn) of drawing menu."""
+    screen_area = screen.get_width() * screen.get_height()
+    drawn_area = 0
+
+    start = time.perf_counter()
+    for frame in range(frames):
+        if events_for is not None:
+            for event in events_for(frame):
+                menu.handle_event(event)
+        drawn_area += sum(rect.width * rect.height for rect in menu.draw(screen))
+    seconds = time.perf_counter() - start
+
+    return seconds * 1000 / frames, drawn_area / screen_area / frames
+
+def main(frames=DEFAULT_FRAMES):
+    pygame.init()
+    screen = pygame.Surface((settings.screen_width, settings.screen_height))
+    main_menu = MainMenu(lambda name: None)
+
+    print(f"{'':<28}{'ms/frame':>10}{'redrawn':>10}")
+
+    milliseconds, redrawn = measure_menu(main_menu.main_menu, screen, frames)
+    print(f"{'main menu':<28}{milliseconds:>10.3f}{redrawn:>10.1%}")
+
+    # Activate the text box, then type a character every frame
+    text_box = main_menu.settings_menu.items[1]
+    main_menu.settings_menu.handle_event(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=text_box.rect.center, button=1))
+    milliseconds, redrawn = measure_menu(main_menu.settings_menu, screen, frames)
+    print(f"{'settings menu':<28}{milliseconds:>10.3f}{redrawn:>10.1%}")
+    milliseconds, redrawn = measure_menu(main_menu.settings_menu, screen, frames, typing_events)
+    print(f"{'settings menu, typing':<28}{milliseconds:>10.3f}{redrawn:>10.1%}")
+
+    result = headless.run(DummyLevel, frames, InputScript(), render=True)
+    print(f"{'dummy level':<28}{result.seconds * 1000 / frames:>10.3f}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FRAMES)
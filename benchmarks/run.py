@@ -0,0 +1,90 @@
+"""
+Run the standard benchmark scenarios headless and report per-phase ms/frame percentiles.
+
+    python -m benchmarks.run [scenario ...] [--frames N] [--warmup N] [--json out.json] [--compare base.json]
+
+Scenarios are seeded and run a fixed number of frames after a warm-up, so results from different
+commits on the same machine can be compared with --compare.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import headless
+from headless import InputScript
+from object_pool import ObjectPool
+from sprite_cache import sprite_cache
+from profiler import profiler
+from benchmarks.scenarios import SCENARIOS, SCENARIOS_BY_NAME, SEED
+
+DEFAULT_FRAMES = 300
+DEFAULT_WARMUP = 30
+COLUMNS = ('mean', 'p50', 'p90', 'p99')
+
+def run_scenario(scenario, frames=DEFAULT_FRAMES, warmup=DEFAULT_WARMUP):
+    """Run one scenario from a clean state and return {'frames': ..., 'phases': profiler summary}."""
+    random.seed(SEED)
+    for pool in ObjectPool.pools:
+        pool.clear()
+    sprite_cache.clear()
+
+    level = headless.start_level(scenario.level_class)
+    inputs = InputScript({1: scenario.keys})
+
+    profiler.enable()
+    profiler.clear()
+    headless.run(None, warmup, inputs, scenario.render, level=level)
+    profiler.clear()
+    result = headless.run(None, frames, inputs, scenario.render, level=level)
+    summary = profiler.summary()
+    profiler.enable(False)
+
+    return {'frames': frames, 'fps': result.fps, 'phases': summary}
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(results, baseline=None):
+    for name, result in results.items():
+        print(f"\n{name}: {SCENARIOS_BY_NAME[name].description} ({result['frames']} frames, {result['fps']:.1f} fps)")
+        print(f"  {'phase':<12}" + ''.join(f"{column + ' ms':>11}" for column in COLUMNS) +
+              (f"{'p50 vs base':>13}" if baseline else ''))
+
+        base_phases = baseline.get('scenarios', {}).get(name, {}).get('phases', {}) if baseline else {}
+        for phase, stats in result['phases'].items():
+            line = f"  {phase:<12}" + ''.join(f"{stats[column]:>11.3f}" for column in COLUMNS)
+            base = base_phases.get(phase)
+            if base and base['p50']:
+                line += f"{(stats['p50'] / base['p50'] - 1) * 100:>+12.1f}%"
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark scenarios.")
+    parser.add_argument('scenarios', nargs='*', help="scenario names (all by default): " + ', '.join(SCENARIOS_BY_NAME))
+    parser.add_argument('--frames', type=int, default=DEFAULT_FRAMES)
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP)
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', help="results file of an earlier run to compare p50s against")
+    args = parser.parse_args()
+
+    scenarios = [SCENARIOS_BY_NAME[name] for name in args.scenarios] if args.scenarios else SCENARIOS
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    results = {scenario.name: run_scenario(scenario, args.frames, args.warmup) for scenario in scenarios}
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'revision': git_revision(), 'python': platform.python_version(), 'machine': platform.machine(),
+                       'scenarios': results}, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Standard benchmark workloads, each a Level subclass whose on_frame generates a fixed, seeded load.
+
+Every scenario draws from random number generators seeded at level creation, so repeated runs (and
+runs on different commits) simulate the same frames.
+"""
+import random
+import numpy as np
+import pygame
+from settings import settings
+from global_objects import globals
+from general_objects.level import Level
+from general_objects.player import Player
+from game_object import GameObject
+from square import Square
+from dummy_objects.particle import Particle
+from dummy_objects.particle_level import ParticleLevel
+from dummy_objects.background import Background
+from dummy_objects.map_outline_barrier import MapOutlineBarrier
+from custom_event_level_test.level import CusomEventLevel
+from custom_event_engine.custom_event_engine import Ability, compile_program
+from custom_event_level_test.ability1 import ability_desc as ability_desc1
+from custom_event_level_test.ability2 import ability_desc as ability_desc2
+
+SEED = 1234
+
+class ParticleStormLevel(ParticleLevel):
+    """ParticleLevel emitting PARTICLES_PER_FRAME particles every frame through its emitter."""
+
+    PARTICLES_PER_FRAME = 500
+
+    def __init__(self, screen):
+        super().__init__(screen)
+        self.rng = np.random.default_rng(SEED)
+
+    def on_frame(self, events, keys_pressed):
+        count = self.PARTICLES_PER_FRAME
+        self.emitter.emit_many(self.rng.integers(0, settings.map_width * 2, count), np.zeros(count, dtype=int),
+                               self.rng.integers(-1, 1, count, endpoint=True), np.ones(count, dtype=int))
+
+class ParticleObjectStormLevel(ParticleLevel):
+    """ParticleLevel spawning PARTICLES_PER_FRAME Particle objects every frame, without the emitter."""
+
+    USE_PARTICLE_EMITTER = False
+    PARTICLES_PER_FRAME = 30
+
+    def __init__(self, screen):
+        super().__init__(screen)
+        self.rng = random.Random(SEED)
+
+    def on_frame(self, events, keys_pressed):
+        for _ in range(self.PARTICLES_PER_FRAME):
+            Particle.pool.acquire(self.rng.randint(0, settings.map_width * 2), 0, self.rng.choice((-1, 0, 1)), 1).register()
+
+class AbilitySpamLevel(CusomEventLevel):
+    """CusomEventLevel casting ability1 and ability2 CASTS_PER_FRAME times each every frame."""
+
+    CASTS_PER_FRAME = 5
+    BATCHED = True  # Run the event objects through the batch interpreter
+
+    def __init__(self, screen):
+        super().__init__(screen)
+
+        if not self.BATCHED:
+            self.player.interpreter = None
+
+        self.programs = [compile_program(Ability.parse_obj(desc).event_object) for desc in (ability_desc1, ability_desc2)]
+
+    def on_frame(self, events, keys_pressed):
+        for program in self.programs:
+            for _ in range(self.CASTS_PER_FRAME):
+                self.player.cast(program)
+
+class AbilitySpamObjectsLevel(AbilitySpamLevel):
+    BATCHED = False
+
+class DenseGeometryLevel(Level):
+    """
+    A map packed with small static walls, crossed by a stream of colliding particles and the player,
+    so most of the frame is spent in the collision grid.
+    """
+
+    WALL_SPACING = 4
+    PARTICLES_PER_FRAME = 20
+    WALL_COLOR = (0, 160, 0)
+
+    def __init__(self, screen):
+        super().__init__(screen)
+
+        self.rng = random.Random(SEED)
+        self.player = Player()
+        self.objects = [Background(), MapOutlineBarrier()]
+
+        wall_squares = [Square(0, 0, 2, 1, self.WALL_COLOR)]
+        for x in range(2, settings.map_width - 2, self.WALL_SPACING):
+            for y in range(2, settings.map_height - 2, self.WALL_SPACING):
+                if (x, y) != (self.player.x, self.player.y):
+                    self.objects.append(GameObject(x, y + (x // self.WALL_SPACING) % 2, wall_squares, static=True))
+
+    def on_frame(self, events, keys_pressed):
+        for _ in range(self.PARTICLES_PER_FRAME):
+            Particle.pool.acquire(self.rng.randint(0, settings.map_width * 2), 1, self.rng.choice((-1, 0, 1)), 1).register()
+
+class Wanderer(GameObject):
+    """A non-collidable multi-square object taking a random step every MOVE_INTERVAL frames."""
+
+    MOVE_INTERVAL = 16
+
+    def __init__(self, x, y, squares, rng):
+        super().__init__(x, y, squares, collidable=False)
+        self.rng = rng
+        self.move_phase = rng.randrange(self.MOVE_INTERVAL)
+
+    def on_frame(self, events, keys_pressed):
+        if (globals.frame_count + self.move_phase) % self.MOVE_INTERVAL == 0:
+            self.move(self.rng.randint(-1, 1), self.rng.randint(-1, 1))
+
+class DrawHeavyLevel(Level):
+    """Thousands of moving multi-square objects in and around the camera view, so drawing dominates."""
+
+    OBJECT_COUNT = 4000
+    PALETTE = [(200, 60, 60), (60, 200, 60), (60, 60, 200), (200, 200, 60), (200, 60, 200)]
+
+    def __init__(self, screen):
+        super().__init__(screen)
+
+        self.rng = random.Random(SEED)
+        self.player = Player()
+        self.objects = [Background(), MapOutlineBarrier()]
+
+        # A handful of shared models, like objects spawned from a few abilities
+        models = [[Square(0, 0, 2, 2, color), Square(2, 1, 1, 1, other), Square(-1, 2, 3, 1, color)]
+                  for color in self.PALETTE for other in self.PALETTE]
+        for _ in range(self.OBJECT_COUNT):
+            self.objects.append(Wanderer(self.rng.randint(0, settings.map_width), self.rng.randint(0, settings.map_height),
+                                         self.rng.choice(models), self.rng))
+
+class Scenario:
+    def __init__(self, name, level_class, keys=(), render=True, description=''):
+        self.name = name
+        self.level_class = level_class
+        self.keys = keys  # Keys held for the whole run
+        self.render = render
+        self.description = description
+
+SCENARIOS = [
+    Scenario('particle_storm', ParticleStormLevel, description="emitter, 500 particles/frame"),
+    Scenario('particle_storm_objects', ParticleObjectStormLevel, description="Particle objects, 30/frame"),
+    Scenario('ability_spam', AbilitySpamLevel, description="ability1 + ability2, 5 casts/frame each, batched"),
+    Scenario('ability_spam_objects', AbilitySpamObjectsLevel, description="same casts as CustomEventObjects"),
+    Scenario('dense_geometry', DenseGeometryLevel, keys=(pygame.K_RIGHT, pygame.K_DOWN), description="~700 static walls, 20 colliding particles/frame"),
+    Scenario('draw_heavy', DrawHeavyLevel, keys=(pygame.K_RIGHT,), description="4000 slowly moving 3-square objects"),
+]
+
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
@@ -0,0 +1,97 @@
+"""
+Save and load times of world snapshots.
+
+Fills a level with a large number of entities of each kind (Particle objects, event objects, event
+objects run by the batch interpreter, emitter particles) and reports the snapshot size and the time
+save_world and load_world take, loading included rebuilding the collision grid, next to the accepted
+load time. Run from the repository root:
+
+    python -m benchmarks.snapshot [count]
+"""
+import sys
+import time
+import numpy as np
+import pygame
+import headless
+import world_snapshot
+from global_objects import globals
+from dummy_objects.particle import Particle
+from dummy_objects.particle_level import ParticleLevel
+from custom_event_level_test.level import CusomEventLevel
+from custom_event_engine.custom_event_engine import Ability, CustomEventObject, compile_program
+from custom_event_level_test.ability1 import ability_desc
+
+DEFAULT_COUNT = 50000
+REPEATS = 3
+
+# Accepted load times for DEFAULT_COUNT entities, as measured here (scaled with the count). Entities kept in
+# arrays load in milliseconds. Registered objects do not: each one is created, filled in and put back in the
+# collision grid (about 60% of the time) in Python, and getting them to milliseconds would take storing
+# them in arrays too.
+LOAD_TARGET_MS = {
+    'Particle': 500,
+    'CustomEventObject': 520,
+    'batched instances': 25,
+    'emitter particles': 20,
+}
+
+def add_particles(count):
+    level = headless.start_level(ParticleLevel)
+    for i in range(count):
+        Particle(i % 128, i % 96, 1, 1).register()
+    return level
+
+def add_event_objects(count):
+    level = headless.start_level(CusomEventLevel)
+    program = compile_program(Ability.parse_obj(ability_desc).event_object)
+    for i in range(count):
+        level.player.x, level.player.y = i % 128, i % 96
+        CustomEventObject.pool.acquire(program, level.player).register()
+    return level
+
+def add_batched_instances(count):
+    level = headless.start_level(CusomEventLevel)
+    program = compile_program(Ability.parse_obj(ability_desc).event_object)
+    level.player.interpreter.batch_for(program).spawn(np.arange(count) % 128, np.arange(count) % 96)
+    return level
+
+def add_emitter_particles(count):
+    level = headless.start_level(ParticleLevel)
+    level.emitter.emit_many(np.arange(count) % 128, np.arange(count) % 96, np.ones(count, dtype=int), np.zeros(count, dtype=int))
+    return level
+
+def measure(fill, count):
+    """Return (snapshot bytes, best save seconds, best load seconds) for a world filled by fill(count)."""
+    fill(count)
+    data = world_snapshot.save_world()
+
+    save_seconds = load_seconds = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        data = world_snapshot.save_world()
+        save_seconds = min(save_seconds, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        world_snapshot.load_world(data, globals.current_level.screen)
+        load_seconds = min(load_seconds, time.perf_counter() - start)
+
+    return len(data), save_seconds, load_seconds
+
+def main(count=DEFAULT_COUNT):
+    pygame.init()
+
+    scenarios = [
+        ('Particle', add_particles),
+        ('CustomEventObject', add_event_objects),
+        ('batched instances', add_batched_instances),
+        ('emitter particles', add_emitter_particles),
+    ]
+
+    print(f"{'entities':<20}{'count':>10}{'KiB':>10}{'save ms':>10}{'load ms':>10}{'target ms':>11}")
+    for name, fill in scenarios:
+        size, save_seconds, load_seconds = measure(fill, count)
+        target_ms = LOAD_TARGET_MS[name] * count / DEFAULT_COUNT
+        print(f"{name:<20}{count:>10}{size / 1024:>10.0f}{save_seconds * 1000:>10.1f}{load_seconds * 1000:>10.1f}{target_ms:>11.1f}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT)
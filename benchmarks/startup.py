@@ -0,0 +1,117 @@
+"""
+Cold start budget: what starting the game costs before the first menu frame is on screen.
+
+Starts the game in fresh interpreters (with SDL's dummy video driver unless SDL_VIDEODRIVER is set) and
+reports, as the median of several runs:
+- the import time of rogue_gpt on top of pygame, from `python -X importtime`, with the game modules
+  costing the most
+- the time from launching the interpreter to the first menu frame being shown on the display
+
+and exits with an error if either is over its budget, so a level or module that makes the game start
+slower shows up before players notice. Levels are imported once picked in the menu (see levels.py), so
+neither number should grow with the number of levels. Run from the repository root:
+
+    python -m benchmarks.startup [--runs N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+IMPORT_BUDGET_MS = 50
+FIRST_FRAME_BUDGET_MS = 600
+DEFAULT_RUNS = 5
+SHOWN_MODULES = 8
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# pygame is imported first, so rogue_gpt's cumulative import time only counts what the game adds
+IMPORT_SCRIPT = "import pygame; import rogue_gpt"
+
+# Quits after the first frame, and prints when that frame was presented
+FIRST_FRAME_SCRIPT = """
+import os, time
+import pygame
+import rogue_gpt
+
+# The menu updates only the rects it redrew, the first frame is either call
+def presented(present):
+    def first_frame(*args):
+        present(*args)
+        print(time.time() - float(os.environ['STARTUP_LAUNCH_TIME']))
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+    return first_frame
+pygame.display.flip = presented(pygame.display.flip)
+pygame.display.update = presented(pygame.display.update)
+
+try:
+    rogue_gpt.main()
+except SystemExit:
+    pass
+"""
+
+def run_python(arguments, extra_environment=None):
+    environment = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1', **(extra_environment or {}))
+    environment.setdefault('SDL_VIDEODRIVER', 'dummy')
+    return subprocess.run([sys.executable, *arguments], cwd=ROOT, env=environment, capture_output=True, text=True, check=True)
+
+def is_game_module(name):
+    top_level = name.split('.')[0]
+    return os.path.exists(os.path.join(ROOT, top_level + '.py')) or os.path.isdir(os.path.join(ROOT, top_level))
+
+def measure_imports():
+    """Return (rogue_gpt cumulative import ms, {game module: self import ms}) of one cold import."""
+    output = run_python(['-X', 'importtime', '-c', IMPORT_SCRIPT]).stderr
+
+    total = None
+    modules = {}
+    for line in output.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        if name == 'rogue_gpt':
+            total = int(cumulative_us) / 1000
+        if is_game_module(name):
+            modules[name] = int(self_us) / 1000
+
+    return total, modules
+
+def measure_first_frame():
+    """Milliseconds from launching the interpreter to the first menu frame."""
+    launch_time = time.time()
+    output = run_python(['-c', FIRST_FRAME_SCRIPT], {'STARTUP_LAUNCH_TIME': repr(launch_time)}).stdout
+    return float(output.split()[-1]) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the game's cold start against its budget.")
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS)
+    args = parser.parse_args()
+
+    import_times = []
+    module_times = {}
+    first_frame_times = []
+    for _ in range(args.runs):
+        total, modules = measure_imports()
+        import_times.append(total)
+        for name, milliseconds in modules.items():
+            module_times.setdefault(name, []).append(milliseconds)
+        first_frame_times.append(measure_first_frame())
+
+    import_ms = statistics.median(import_times)
+    first_frame_ms = statistics.median(first_frame_times)
+
+    print(f"rogue_gpt import (on top of pygame) {import_ms:8.1f} ms   budget {IMPORT_BUDGET_MS} ms")
+    slowest = sorted(module_times.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:SHOWN_MODULES]
+    for name, times in slowest:
+        print(f"    {name:<40}{statistics.median(times):8.1f} ms")
+    print(f"launch to first menu frame          {first_frame_ms:8.1f} ms   budget {FIRST_FRAME_BUDGET_MS} ms")
+
+    if import_ms > IMPORT_BUDGET_MS or first_frame_ms > FIRST_FRAME_BUDGET_MS:
+        raise SystemExit("Cold start over budget")
+
+if __name__ == '__main__':
+    main()
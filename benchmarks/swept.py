@@ -0,0 +1,105 @@
+"""
+Cost per projectile of a move, without collision checks, checking the destination and swept.
+
+Fires a number of collidable 1-pixel projectiles moving 2 pixels right and 1 down per frame at a row of
+1-pixel walls, like ability2's diagonal shards (projectiles block each other too), and reports for each
+way of moving the mean microseconds per projectile move and how many projectiles ended up past the first
+wall (tunneled). It first checks that swept moves stopped on a diagonal path between blocks never come to
+rest overlapping a block. Run from the repository root:
+
+    python -m benchmarks.swept [count]
+"""
+import random
+import sys
+import time
+from settings import settings
+from global_objects import globals
+from camera import Camera
+from collision import CollisionGrid
+from scheduler import FrameScheduler
+from game_object import GameObject
+from square import Square
+
+DEFAULT_COUNT = 2000
+FRAMES = 30
+SPEED = (2, 1)
+WALL_SPACING = 7  # Odd, so projectiles moving 2 pixels per frame reach every wall on both parities
+FIRST_WALL_X = 20
+STOP_CASES = 5000  # Diagonal stops checked for overlaps
+SEED = 1234
+BLOCKS = 6  # Scattered around the projectile in every diagonal stop case
+
+class Projectile(GameObject):
+    __slots__ = ()
+
+    SQUARES = [Square(0, 0, 1, 1, (255, 255, 255))]
+
+    def __init__(self, x, y, collidable, squares=None):
+        super().__init__(x, y, squares if squares else self.SQUARES, collidable=collidable)
+
+    def on_collision_active(self, other):
+        return True  # Stopped by walls
+
+def reset_world():
+    globals.game_objects.clear()
+    globals.camera = Camera()
+    globals.collision_grid = CollisionGrid()
+    globals.scheduler = FrameScheduler()
+
+def build_world(count, collidable):
+    reset_world()
+
+    wall_squares = [Square(0, 0, 1, settings.map_height * 2, (128, 128, 128))]
+    for x in range(FIRST_WALL_X, settings.map_width, WALL_SPACING):
+        GameObject(x, 0, wall_squares, static=True).register()
+
+    projectiles = [Projectile(index % FIRST_WALL_X, index % settings.map_height, collidable) for index in range(count)]
+    for projectile in projectiles:
+        projectile.register()
+    return projectiles
+
+def measure(count, collidable, swept):
+    """Return (microseconds per projectile move, projectiles past the first wall)."""
+    projectiles = build_world(count, collidable)
+
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        for projectile in projectiles:
+            projectile.move(*SPEED, swept=swept)
+    seconds = time.perf_counter() - start
+
+    tunneled = sum(projectile.x > FIRST_WALL_X for projectile in projectiles)
+    return seconds * 1e6 / (count * FRAMES), tunneled
+
+def check_diagonal_stops(cases=STOP_CASES):
+    """Fire projectiles of a few sizes along random diagonals between blocks, and assert none stops overlapping one."""
+    rng = random.Random(SEED)
+    for _ in range(cases):
+        reset_world()
+        for _ in range(BLOCKS):
+            block_squares = [Square(0, 0, rng.randint(1, 3), rng.randint(1, 3), (128, 128, 128))]
+            GameObject(rng.randint(12, 28), rng.randint(12, 28), block_squares).register()
+
+        size = rng.randint(1, 3)
+        projectile = Projectile(rng.randint(10, 30), rng.randint(10, 30), True, [Square(0, 0, size, size, (255, 255, 255))])
+        projectile.register()
+        if next(globals.collision_grid.query(projectile, projectile.x, projectile.y), None) is not None:
+            projectile.unregister()
+            continue  # Starts inside a block
+
+        dx, dy = rng.choice((-1, 1)) * rng.randint(1, 9), rng.choice((-1, 1)) * rng.randint(1, 9)
+        start = (projectile.x, projectile.y)
+        contact = projectile.move(dx, dy, swept=True)
+        assert next(globals.collision_grid.query(projectile, projectile.x, projectile.y), None) is None, \
+            f"{size}x{size} projectile moving ({dx}, {dy}) from {start} stopped at ({projectile.x}, {projectile.y}) inside a block (contact {contact})"
+
+def main(count=DEFAULT_COUNT):
+    check_diagonal_stops()
+
+    print(f"{'move':<16}{'us/move':>10}{'tunneled':>10}")
+    for name, collidable, swept in (('unchecked', False, False), ('destination', True, False), ('swept', True, True)):
+        microseconds, tunneled = measure(count, collidable, swept)
+        print(f"{name:<16}{microseconds:>10.2f}{tunneled:>10}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT)
@@ -1,31 +1,460 @@
+from settings import settings
+
+class CollisionCounters:
+    """Running totals of the work an InstrumentedCollisionGrid does."""
+
+    FIELDS = ('registers', 'unregisters', 'cells_written', 'probes', 'candidate_pairs', 'callbacks', 'max_cell_objects')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.registers = 0  # register calls
+        self.unregisters = 0  # unregister calls
+        self.cells_written = 0  # Objects added to or removed from a bucket
+        self.probes = 0  # Buckets looked up for registering, querying or sweeping a rectangle
+        self.candidate_pairs = 0  # Narrowphase rectangle tests against objects found in the buckets
+        self.callbacks = 0  # Contacts reported to objects, each fires on_collision_active and on_collision_passive
+        self.max_cell_objects = 0  # Most objects seen in a single bucket
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
 class CollisionGrid:
-    # Grid to track object locations
-    grid = {}
+    """
+    Spatial hash that stores every square of an object as a rectangle in coarse buckets.
+
+    Each bucket covers bucket_size x bucket_size game-world pixels, so registering, unregistering
+    and querying an object costs one operation per bucket touched instead of one per pixel covered.
+
+    Every registered object is indexed, so the grid also answers visibility queries; collision
+    queries skip objects that are not collidable.
+
+    Counters of the grid's work are opt-in (enable_counters) and cost nothing while disabled: enabling
+    them switches the grid to InstrumentedCollisionGrid, whose overrides do the counting.
+    """
+
+    counters = None  # CollisionCounters while counting is enabled
+
+    def __init__(self, bucket_size=None):
+        self.bucket_size = bucket_size if bucket_size else settings.collision_bucket_size
+
+        # Bucket position -> objects whose squares overlap that bucket (dict used as an ordered set)
+        self.grid = {}
+
+        # Object -> {bucket position: number of the object's squares touching that bucket}
+        self.object_buckets = {}
+
+        # Object -> bounding box of its squares relative to its position, used as a cheap broadphase
+        self.object_bounds = {}
+
+        if settings.collision_counters:
+            self.enable_counters()
+
+    def local_bounds(self, obj):
+        """Bounding box (left, top, right, bottom) of an object's squares relative to its position."""
+        squares = [square for square in obj.squares if square.width > 0 and square.height > 0]
+        if not squares:
+            return None
+
+        return (min(square.offset_x for square in squares),
+                min(square.offset_y for square in squares),
+                max(square.offset_x + square.width for square in squares),
+                max(square.offset_y + square.height for square in squares))
+
+    def square_rect(self, x, y, square):
+        """Rectangle (left, top, right, bottom) covered by a square when its object sits at (x, y)."""
+        left = x + square.offset_x
+        top = y + square.offset_y
+        return left, top, left + square.width, top + square.height
+
+    def bucket_range(self, left, top, right, bottom):
+        """Inclusive range (first_x, first_y, last_x, last_y) of buckets touched by [left, right) x [top, bottom)."""
+        if right <= left or bottom <= top:
+            return None
+
+        size = self.bucket_size
+        return left // size, top // size, (right - 1) // size, (bottom - 1) // size
+
+    def rect_buckets(self, left, top, right, bottom):
+        """All bucket positions touched by the rectangle [left, right) x [top, bottom)."""
+        bucket_range = self.bucket_range(left, top, right, bottom)
+        if bucket_range is None:
+            return []
+
+        first_x, first_y, last_x, last_y = bucket_range
+        return [(bx, by) for bx in range(first_x, last_x + 1) for by in range(first_y, last_y + 1)]
+
+    def range_difference(self, a, b):
+        """
+        Yield the buckets of range a that are not in range b.
+
+        Only the rows and columns of a outside of b are visited, so moving a square costs the
+        leading edge it enters and the trailing edge it leaves rather than its whole area.
+        """
+        if a is None:
+            return
+        if b is None:
+            b = (0, 0, -1, -1)
+
+        first_x, first_y, last_x, last_y = a
+        other_first_x, other_first_y, other_last_x, other_last_y = b
+        for by in range(first_y, last_y + 1):
+            if by < other_first_y or by > other_last_y:
+                for bx in range(first_x, last_x + 1):
+                    yield bx, by
+                continue
+
+            for bx in range(first_x, min(last_x, other_first_x - 1) + 1):
+                yield bx, by
+            for bx in range(max(first_x, other_last_x + 1), last_x + 1):
+                yield bx, by
+
+    def add_to_bucket(self, obj, counts, bucket):
+        if bucket in counts:
+            counts[bucket] += 1
+            return
+
+        counts[bucket] = 1
+        if bucket in self.grid:
+            self.grid[bucket][obj] = None
+        else:
+            self.grid[bucket] = {obj: None}
+
+    def remove_from_bucket(self, obj, counts, bucket):
+        counts[bucket] -= 1
+        if counts[bucket]:
+            return
+
+        del counts[bucket]
+        cell = self.grid[bucket]
+        del cell[obj]
+        if not cell:  # Clean up empty buckets
+            del self.grid[bucket]
 
     # Register an object in the spatial grid
     def register(self, obj):
-        """Register all squares of an object in the grid by their (x, y) positions."""
-        if not obj.collidable:
-            return  # Exempted objects are not registered for collision
+        """Register all squares of an object in the buckets their rectangles overlap."""
+        if obj in self.object_buckets:
+            self.unregister(obj)
+
+        counts = {}
         for square in obj.squares:
-            for i in range(square.width):
-                for j in range(square.height):
-                    grid_pos = (obj.x + square.offset_x + i, obj.y + square.offset_y + j)
-                    if grid_pos in self.grid:
-                        self.grid[grid_pos].append(obj)
-                    else:
-                        self.grid[grid_pos] = [obj]
+            for bucket in self.rect_buckets(*self.square_rect(obj.x, obj.y, square)):
+                self.add_to_bucket(obj, counts, bucket)
+
+        self.object_buckets[obj] = counts
+        self.object_bounds[obj] = self.local_bounds(obj)
+
+    def register_all(self, objects):
+        """
+        Register many objects not in the grid yet, in order (e.g. a whole loaded world).
+
+        Does the same as registering them one by one, but the square rectangles and bounds of a model are
+        worked out once for all the objects sharing its squares list.
+        """
+        grid = self.grid
+        size = self.bucket_size
+        models = {}  # id(squares) -> (squares, bounds, inclusive pixel rectangles of the non-empty squares)
+        for obj in objects:
+            squares = obj.squares
+            model = models.get(id(squares))
+            if model is None or model[0] is not squares:
+                rects = [(square.offset_x, square.offset_y, square.offset_x + square.width - 1, square.offset_y + square.height - 1)
+                         for square in squares if square.width > 0 and square.height > 0]
+                model = models[id(squares)] = (squares, self.local_bounds(obj), rects)
+
+            # Same buckets in the same order as register (see rect_buckets)
+            x, y = obj.x, obj.y
+            counts = {}
+            for left, top, right, bottom in model[2]:
+                first_y, last_y = (y + top) // size, (y + bottom) // size
+                for bx in range((x + left) // size, (x + right) // size + 1):
+                    for by in range(first_y, last_y + 1):
+                        bucket = (bx, by)
+                        if bucket in counts:
+                            counts[bucket] += 1
+                            continue
+
+                        counts[bucket] = 1
+                        cell = grid.get(bucket)
+                        if cell is None:
+                            grid[bucket] = {obj: None}
+                        else:
+                            cell[obj] = None
+
+            self.object_buckets[obj] = counts
+            self.object_bounds[obj] = model[1]
 
     # Unregister an object from the grid
     def unregister(self, obj):
-        """Remove an object from its current position in the grid."""
-        if not obj.collidable:
-            return  # Exempted objects are not registered for collision
+        """Remove an object from every bucket it is registered in."""
+        counts = self.object_buckets.pop(obj, None)
+        if counts is None:
+            return  # Already unregistered
+
+        del self.object_bounds[obj]
+
+        for bucket in counts:
+            cell = self.grid[bucket]
+            del cell[obj]
+            if not cell:  # Clean up empty buckets
+                del self.grid[bucket]
+
+    def move(self, obj, new_x, new_y):
+        """
+        Update a registered object's buckets for a move from (obj.x, obj.y) to (new_x, new_y).
+
+        Only the buckets entered and left by each square are touched. The caller updates obj.x and
+        obj.y afterwards.
+        """
+        counts = self.object_buckets.get(obj)
+        if counts is None:
+            return  # Unregistered objects are not in the grid
+
+        leaving = []
+        for square in obj.squares:
+            old_range = self.bucket_range(*self.square_rect(obj.x, obj.y, square))
+            new_range = self.bucket_range(*self.square_rect(new_x, new_y, square))
+            if old_range == new_range:
+                continue  # The common case: the square stays within the same buckets
+
+            for bucket in self.range_difference(new_range, old_range):
+                self.add_to_bucket(obj, counts, bucket)
+            leaving.extend(self.range_difference(old_range, new_range))
+
+        # Leave buckets only after entering the new ones, so a bucket handed over between
+        # two squares of the same object keeps its place in the cell
+        for bucket in leaving:
+            self.remove_from_bucket(obj, counts, bucket)
+
+    def overlaps(self, rect, other):
+        """Whether the rectangle overlaps any square of other at its registered position."""
+        left, top, right, bottom = rect
+        for square in other.squares:
+            other_left, other_top, other_right, other_bottom = self.square_rect(other.x, other.y, square)
+            if left < other_right and other_left < right and top < other_bottom and other_top < bottom:
+                return True
+        return False
+
+    def query(self, obj, x, y):
+        """
+        Yield every registered object (other than obj) that would overlap obj if it were placed at (x, y).
+
+        Squares are tested rectangle-to-rectangle against the objects found in the buckets they touch,
+        in the order of obj's squares.
+        """
+        seen = {obj}
         for square in obj.squares:
-            for i in range(square.width):
-                for j in range(square.height):
-                    grid_pos = (obj.x + square.offset_x + i, obj.y + square.offset_y + j)
-                    if grid_pos in self.grid and obj in self.grid[grid_pos]:
-                        self.grid[grid_pos].remove(obj)
-                        if not self.grid[grid_pos]:  # Clean up empty grid cells
-                            del self.grid[grid_pos]
+            rect = self.square_rect(x, y, square)
+            for bucket in self.rect_buckets(*rect):
+                cell = self.grid.get(bucket)
+                if not cell:
+                    continue
+
+                for other in cell:
+                    if other in seen or not other.collidable:
+                        continue
+                    if self.overlaps(rect, other):
+                        seen.add(other)
+                        yield other
+
+    def query_rect(self, left, top, right, bottom):
+        """Return every registered object whose bounding box overlaps the rectangle [left, right) x [top, bottom)."""
+        found = {}
+        for bucket in self.rect_buckets(left, top, right, bottom):
+            cell = self.grid.get(bucket)
+            if not cell:
+                continue
+
+            for other in cell:
+                if other in found:
+                    continue
+
+                other_bounds = self.object_bounds[other]
+                if other.x + other_bounds[0] < right and left < other.x + other_bounds[2] and \
+                        other.y + other_bounds[1] < bottom and top < other.y + other_bounds[3]:
+                    found[other] = None
+
+        return list(found)
+
+    def entry_time(self, rect, dx, dy, other_rect):
+        """
+        Swept-AABB test: the time in [0, 1) at which rect, travelling by (dx, dy), starts overlapping
+        other_rect, or None if it never does.
+
+        A rect that already overlaps other_rect only counts as a contact (at time 0) if it still
+        overlaps it at the end of the move, so objects can always move out of an overlap.
+        """
+        t_enter = float('-inf')
+        t_exit = float('inf')
+        for low, high, other_low, other_high, delta in (
+                (rect[0], rect[2], other_rect[0], other_rect[2], dx),
+                (rect[1], rect[3], other_rect[1], other_rect[3], dy)):
+            if delta == 0:
+                if low >= other_high or other_low >= high:
+                    return None  # Never overlapping on this axis
+                continue
+
+            axis_enter = (other_low - high) / delta
+            axis_exit = (other_high - low) / delta
+            if delta < 0:
+                axis_enter, axis_exit = axis_exit, axis_enter
+
+            t_enter = max(t_enter, axis_enter)
+            t_exit = min(t_exit, axis_exit)
+            if t_enter >= t_exit:
+                return None
+
+        if t_enter < 0:
+            return 0.0 if t_exit > 1 else None
+
+        return t_enter if t_enter < 1 else None
+
+    def sweep(self, obj, dx, dy):
+        """
+        Find the first contact of obj travelling from its position by (dx, dy).
+
+        Objects in the buckets touched by the swept bounding box are first rejected by bounding box,
+        and only the remaining candidates are tested square by square.
+
+        Returns:
+            (t, other) for the earliest contact, where t in [0, 1) is the fraction of the move travelled
+            before touching other, or None if the path is clear.
+        """
+        bounds = self.local_bounds(obj)
+        if bounds is None:
+            return None
+
+        # Bounding box of the whole path
+        sweep_left = obj.x + bounds[0] + min(dx, 0)
+        sweep_top = obj.y + bounds[1] + min(dy, 0)
+        sweep_right = obj.x + bounds[2] + max(dx, 0)
+        sweep_bottom = obj.y + bounds[3] + max(dy, 0)
+
+        first_contact = None
+        seen = {obj}
+        for bucket in self.rect_buckets(sweep_left, sweep_top, sweep_right, sweep_bottom):
+            cell = self.grid.get(bucket)
+            if not cell:
+                continue
+
+            for other in cell:
+                if other in seen or not other.collidable:
+                    continue
+                seen.add(other)
+
+                # Broadphase: reject candidates whose bounding box misses the path entirely
+                other_bounds = self.object_bounds[other]
+                if other_bounds is None or \
+                        other.x + other_bounds[2] <= sweep_left or sweep_right <= other.x + other_bounds[0] or \
+                        other.y + other_bounds[3] <= sweep_top or sweep_bottom <= other.y + other_bounds[1]:
+                    continue
+
+                for square in obj.squares:
+                    rect = self.square_rect(obj.x, obj.y, square)
+                    for other_square in other.squares:
+                        t = self.entry_time(rect, dx, dy, self.square_rect(other.x, other.y, other_square))
+                        if t is not None and (first_contact is None or t < first_contact[0]):
+                            first_contact = (t, other)
+
+                if first_contact is not None and first_contact[0] == 0:
+                    return first_contact  # Nothing can come earlier
+
+        return first_contact
+
+    def enable_counters(self):
+        """Start counting the grid's work from zero, in self.counters."""
+        self.__class__ = InstrumentedCollisionGrid
+        self.counters = CollisionCounters()
+
+    def disable_counters(self):
+        self.__class__ = CollisionGrid
+        self.counters = None
+
+    def occupancy(self):
+        """Snapshot of the number of objects in each non-empty bucket, {bucket position: objects}."""
+        return {bucket: len(cell) for bucket, cell in self.grid.items()}
+
+    def occupancy_histogram(self):
+        """Number of non-empty buckets holding each number of objects, {objects: buckets}, sorted by objects."""
+        histogram = {}
+        for cell in self.grid.values():
+            histogram[len(cell)] = histogram.get(len(cell), 0) + 1
+        return dict(sorted(histogram.items()))
+
+    def occupancy_heatmap(self):
+        """
+        Objects per bucket as rows of a grid covering every non-empty bucket, for drawing a heatmap.
+
+        Returns:
+            ((first bucket x, first bucket y), rows), where rows[y][x] is the number of objects in bucket
+            (first x + x, first y + y); ((0, 0), []) if the grid is empty.
+        """
+        if not self.grid:
+            return (0, 0), []
+
+        first_x = min(bx for bx, _ in self.grid)
+        first_y = min(by for _, by in self.grid)
+        last_x = max(bx for bx, _ in self.grid)
+        last_y = max(by for _, by in self.grid)
+
+        rows = [[0] * (last_x - first_x + 1) for _ in range(last_y - first_y + 1)]
+        for (bx, by), cell in self.grid.items():
+            rows[by - first_y][bx - first_x] = len(cell)
+        return (first_x, first_y), rows
+
+class InstrumentedCollisionGrid(CollisionGrid):
+    """CollisionGrid that counts its work in self.counters, see CollisionGrid.enable_counters."""
+
+    def register(self, obj):
+        self.counters.registers += 1
+        super().register(obj)
+
+    def register_all(self, objects):
+        for obj in objects:
+            self.register(obj)
+
+    def unregister(self, obj):
+        self.counters.unregisters += 1
+        counts = self.object_buckets.get(obj)
+        if counts is not None:
+            self.counters.cells_written += len(counts)
+        super().unregister(obj)
+
+    def add_to_bucket(self, obj, counts, bucket):
+        new_in_bucket = bucket not in counts
+        super().add_to_bucket(obj, counts, bucket)
+        if new_in_bucket:
+            self.counters.cells_written += 1
+            self.counters.max_cell_objects = max(self.counters.max_cell_objects, len(self.grid[bucket]))
+
+    def remove_from_bucket(self, obj, counts, bucket):
+        if counts[bucket] == 1:
+            self.counters.cells_written += 1
+        super().remove_from_bucket(obj, counts, bucket)
+
+    def rect_buckets(self, left, top, right, bottom):
+        buckets = super().rect_buckets(left, top, right, bottom)
+        self.counters.probes += len(buckets)
+        return buckets
+
+    def overlaps(self, rect, other):
+        self.counters.candidate_pairs += 1
+        return super().overlaps(rect, other)
+
+    def entry_time(self, rect, dx, dy, other_rect):
+        self.counters.candidate_pairs += 1
+        return super().entry_time(rect, dx, dy, other_rect)
+
+    def query(self, obj, x, y):
+        # Objects take the first contact reported, and fire their callbacks for it
+        for other in super().query(obj, x, y):
+            self.counters.callbacks += 1
+            yield other
+
+    def sweep(self, obj, dx, dy):
+        contact = super().sweep(obj, dx, dy)
+        if contact is not None:
+            self.counters.callbacks += 1
+        return contact
@@ -0,0 +1,203 @@
+"""
+On-disk cache of validated abilities and their compiled programs.
+
+    ability = load_ability(ability_desc)
+
+Parsing an ability validates its whole description with pydantic, nested create_object trees included,
+and compiling its event object builds the action wrappers of every program in the tree. load_ability
+keeps the result of both in settings.ability_cache_dir, one file per ability, named after a hash of the
+ability description. An unchanged ability loads from its file without being validated or compiled again.
+An ability without a file (new, or changed since the file was written) is parsed and compiled as usual
+and its file is written, so the cache never has to be cleared by hand. The hash also covers a fingerprint
+of the engine's source and the pydantic and Python versions, so files written by another version of the
+code are never loaded. Files of old versions of an ability are left behind, `--prune` removes them.
+
+Compiling costs grow with the square of a create_object tree's depth (every program is validated and
+keyed with its whole subtree), loading only with its size, so the cache pays off on nested abilities
+only. A flat ability, like those of the test level, loads from its file slower than it compiles (see
+benchmarks/ability_cache.py), so the cache is off unless settings.ability_cache_dir is set. A relative
+directory is taken relative to the game's directory, not the current one.
+
+Build the cache ahead of time (e.g. before shipping) with:
+
+    python -m custom_event_engine.ability_cache [module ...] [--directory DIR] [--prune]
+
+where each module defines an ability_desc, the abilities of the test level by default, and the
+directory defaults to settings.ability_cache_dir, or DEFAULT_DIRECTORY while that is None.
+"""
+import argparse
+import hashlib
+import importlib
+import io
+import json
+import os
+import pickle
+import sys
+import pydantic
+from pydantic import ValidationError
+import square
+import sprite_cache
+from settings import settings
+from custom_event_engine import custom_event_engine
+from custom_event_engine.custom_event_engine import Ability, Program, compile_program, content_key, parse_model, restore_program
+
+EXTENSION = '.ability'
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DIRECTORY = '.ability_cache'
+
+# Modules defining what cache files hold (models, wrappers, Program, squares, sprites, this file's format)
+FINGERPRINTED_MODULES = [custom_event_engine, square, sprite_cache, sys.modules[__name__]]
+
+engine_fingerprint = None  # Computed on first use, see get_engine_fingerprint
+
+ABILITY_MODULES = ['custom_event_level_test.ability1', 'custom_event_level_test.ability2']
+
+# Hash of an ability description -> Ability, so abilities are only read from disk once per process
+loaded_abilities = {}
+
+def get_engine_fingerprint():
+    """Hash of the source of FINGERPRINTED_MODULES and the pydantic and Python versions."""
+    global engine_fingerprint
+    if engine_fingerprint is None:
+        fingerprint = hashlib.sha1(f"{pydantic.VERSION}:{sys.version_info[:2]}".encode())
+        for module in FINGERPRINTED_MODULES:
+            with open(module.__file__, 'rb') as file:
+                fingerprint.update(file.read())
+        engine_fingerprint = fingerprint.hexdigest()
+
+    return engine_fingerprint
+
+def ability_hash(ability_desc):
+    """Hash of an ability description and the engine version, stable across processes."""
+    description = json.dumps(ability_desc, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(f"{get_engine_fingerprint()}:{description}".encode()).hexdigest()
+
+class AbilityPickler(pickle.Pickler):
+    def reducer_override(self, obj):
+        # Programs are stored compiled, not as their description (see Program.__reduce__), with their
+        # content key so loading them does not have to dump the description again
+        if type(obj) is Program:
+            return restore_program, (content_key(obj.description), obj.__dict__)
+        return NotImplemented
+
+def dump_ability(ability):
+    """Pickle an ability together with the compiled programs of its event object tree."""
+    file = io.BytesIO()
+    AbilityPickler(file, protocol=pickle.HIGHEST_PROTOCOL).dump((ability, compile_program(ability.event_object)))
+    return file.getvalue()
+
+def cache_directory(directory=None):
+    """The cache directory to use, relative directories resolved against the game's directory."""
+    return os.path.join(ROOT, directory or settings.ability_cache_dir or DEFAULT_DIRECTORY)
+
+def cache_path(key, directory=None):
+    return os.path.join(cache_directory(directory), key + EXTENSION)
+
+def read_ability(path):
+    """Ability stored in a cache file, None if there is no usable file."""
+    try:
+        with open(path, 'rb') as file:
+            ability, _program = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        # Written by an older version of the engine or cut short, it gets rewritten
+        print(f"Ignoring ability cache file {path}: {e!r}")
+        return None
+
+    return ability
+
+def write_ability(path, ability):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Written aside and renamed, so a game starting meanwhile never reads half a file
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as file:
+        file.write(dump_ability(ability))
+    os.replace(temporary_path, path)
+
+def load_ability(ability_desc):
+    """
+    Return the validated Ability of a description, with its programs compiled.
+
+    Args:
+        ability_desc (dict): Ability description, as given to parse_model.
+
+    Raises:
+        ValidationError: If the description is not a valid ability.
+    """
+    key = ability_hash(ability_desc)
+    ability = loaded_abilities.get(key)
+    if ability is not None:
+        return ability
+
+    if settings.ability_cache_dir is None:
+        ability = parse_model(Ability, ability_desc)
+        compile_program(ability.event_object)
+
+    else:
+        path = cache_path(key)
+        ability = read_ability(path)
+        if ability is None:
+            ability = parse_model(Ability, ability_desc)
+            try:
+                write_ability(path, ability)
+            except OSError as e:
+                # A read-only install still runs, it just validates on every start
+                print(f"Could not write ability cache file {path}: {e!r}")
+
+    loaded_abilities[key] = ability
+    return ability
+
+def build(modules, directory=None, prune=False):
+    """
+    Write the cache files of the abilities of modules, returns the number of files written.
+
+    Args:
+        modules (list): Modules each defining an ability_desc.
+        directory (str): Cache directory, settings.ability_cache_dir (or DEFAULT_DIRECTORY) by default.
+        prune (bool): Whether to remove the files of abilities that are not in modules.
+    """
+    directory = cache_directory(directory)
+    written = 0
+    keys = set()
+
+    for module_name in modules:
+        ability_desc = importlib.import_module(module_name).ability_desc
+        key = ability_hash(ability_desc)
+        keys.add(key)
+
+        path = cache_path(key, directory)
+        if read_ability(path) is not None:
+            print(f"{module_name}: up to date")
+            continue
+
+        try:
+            ability = Ability.parse_obj(ability_desc)
+        except ValidationError as e:
+            raise SystemExit(f"{module_name}: invalid ability\n{e}")
+
+        write_ability(path, ability)
+        written += 1
+        print(f"{module_name}: written to {path}")
+
+    if prune and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith(EXTENSION) and name[:-len(EXTENSION)] not in keys:
+                os.remove(os.path.join(directory, name))
+                print(f"removed {name}")
+
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate and compile abilities into the ability cache.")
+    parser.add_argument('modules', nargs='*', default=ABILITY_MODULES, help="modules defining an ability_desc")
+    parser.add_argument('--directory', help=f"cache directory (default {settings.ability_cache_dir or DEFAULT_DIRECTORY})")
+    parser.add_argument('--prune', action='store_true', help="remove the files of abilities not given")
+    args = parser.parse_args()
+
+    build(args.modules, args.directory, args.prune)
+
+if __name__ == '__main__':
+    main()
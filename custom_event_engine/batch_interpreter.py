@@ -0,0 +1,247 @@
+import numpy as np
+import pygame
+from definitions import trace_levels
+from settings import settings
+from global_objects import globals
+from game_object import GameObject
+from square import Square
+from sprite_cache import sprite_cache
+from tracing import tracer
+
+class ProgramBatch(GameObject):
+    """
+    All instances of one compiled program, stepped together.
+
+    Instance state is kept in arrays (position, current action, sleep counter, variables), and every frame
+    each action runs once over all the instances currently on it through ActionWrapper.execute_batch,
+    instead of once per instance through ActionWrapper.execute.
+
+    Instances behave like CustomEventObjects: they are not collidable, start executing on the frame after
+    they were spawned and execute actions eagerly until they sleep or disappear. An instance reaching an
+    action key that does not exist stops executing instead of raising.
+    """
+
+    HALTED = -1  # Current action of instances that ran into a missing action key
+
+    # Guards against programs that loop without ever sleeping (which would recurse forever unbatched)
+    MAX_ACTION_STEPS_PER_FRAME = 10000
+
+    def __init__(self, program, interpreter):
+        super().__init__(0, 0, [], type=program.type, collidable=False)
+
+        self.program = program
+        self.interpreter = interpreter
+
+        self.action_keys = list(program.actions)
+        self.actions = list(program.actions.values())
+        self.action_indices = {key: index for index, key in enumerate(self.action_keys)}
+        self.variable_columns = {}
+
+        # One entry per instance (the batch itself stays at the origin, instance positions are separate)
+        self.instance_x = np.zeros(0, dtype=np.int64)
+        self.instance_y = np.zeros(0, dtype=np.int64)
+        self.current_action = np.zeros(0, dtype=np.int64)
+        self.sleep_counter = np.zeros(0, dtype=np.int64)
+        self.wake_frame = np.zeros(0, dtype=np.int64)  # First frame a sleeping instance runs again
+        self.variables = np.zeros((0, 0), dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.spawn_frame = np.zeros(0, dtype=np.int64)
+
+        self.steps = 0  # Changes whenever the instances do, for dirty-rectangle rendering
+        self.bounds = None
+
+    @property
+    def instance_count(self):
+        return len(self.current_action)
+
+    def spawn(self, xs, ys):
+        """Add instances at the given positions, starting at the program's entry action."""
+        count = len(xs)
+        self.instance_x = np.concatenate([self.instance_x, np.asarray(xs, dtype=np.int64)])
+        self.instance_y = np.concatenate([self.instance_y, np.asarray(ys, dtype=np.int64)])
+        self.current_action = np.concatenate([self.current_action, np.full(count, self.action_index('entry'), dtype=np.int64)])
+        self.sleep_counter = np.concatenate([self.sleep_counter, np.zeros(count, dtype=np.int64)])
+        self.wake_frame = np.concatenate([self.wake_frame, np.zeros(count, dtype=np.int64)])
+        self.variables = np.concatenate([self.variables, np.zeros((count, len(self.variable_columns)), dtype=np.int64)])
+        self.alive = np.concatenate([self.alive, np.ones(count, dtype=bool)])
+        self.spawn_frame = np.concatenate([self.spawn_frame, np.full(count, globals.frame_count, dtype=np.int64)])
+        self.update_bounds()  # New instances are drawn from the frame they spawn in
+        self.steps += 1
+
+        globals.scheduler.wake(self)
+
+    def action_index(self, action_key):
+        return self.action_indices.get(action_key, self.HALTED)
+
+    def set_current_action(self, indices, action_key):
+        self.current_action[indices] = self.action_index(action_key)
+
+    def running(self, indices):
+        """The instances of indices that are still executing (did not halt)."""
+        return indices[self.current_action[indices] != self.HALTED]
+
+    def variable_column(self, name):
+        if name not in self.variable_columns:
+            self.variable_columns[name] = len(self.variable_columns)
+            self.variables = np.concatenate([self.variables, np.zeros((self.instance_count, 1), dtype=np.int64)], axis=1)
+
+        return self.variable_columns[name]
+
+    def get_values(self, value, indices):
+        """Array of a value for each instance of indices: a constant, or a variable's per-instance values."""
+        if type(value) == str:
+            column = self.variable_column(value)
+            return self.variables[indices, column]
+
+        return np.full(len(indices), value, dtype=np.int64)
+
+    def set_variable(self, name, indices, values):
+        column = self.variable_column(name)
+        self.variables[indices, column] = values
+
+    def sleep(self, indices, frames):
+        """Skip the instances of indices for the given numbers of frames, then resume their sleep action."""
+        self.sleep_counter[indices] = frames
+        self.wake_frame[indices] = globals.frame_count + frames
+
+    def disappear(self, indices):
+        self.alive[indices] = False
+        self.current_action[indices] = self.HALTED
+
+    def create_subobjects(self, program, indices):
+        """Spawn an instance of program at the position of each instance of indices."""
+        self.interpreter.batch_for(program).spawn(self.instance_x[indices], self.instance_y[indices])
+
+    def state(self):
+        return (self.instance_x.tobytes(), self.instance_y.tobytes(), self.current_action.tobytes(),
+                self.sleep_counter.tobytes(), self.wake_frame.tobytes(), self.variables.tobytes())
+
+    def on_frame(self, events, keys_pressed):
+        # Instances spawned during this frame start on the next one, like newly registered objects
+        frame = globals.frame_count
+        pending = np.flatnonzero(self.alive & (self.spawn_frame < frame) & (self.wake_frame <= frame) & (self.current_action != self.HALTED))
+
+        steps = 0
+        while len(pending):
+            steps += 1
+            if steps > self.MAX_ACTION_STEPS_PER_FRAME:
+                raise RuntimeError(f"Program of {self.type} executed {self.MAX_ACTION_STEPS_PER_FRAME} actions in one frame without sleeping")
+
+            # Run each action once over all the instances currently on it
+            current = self.current_action[pending]
+            still_running = []
+            for action_index in np.unique(current).tolist():
+                indices = pending[current == action_index]
+                if tracer.level >= trace_levels.DEBUG:
+                    tracer.record(self.id, self.action_keys[action_index], 'batch_' + self.actions[action_index].model.type, instances=len(indices))
+
+                still_running.append(self.actions[action_index].execute_batch(self, indices))
+
+            pending = np.concatenate(still_running)
+
+        self.remove_disappeared()
+        self.update_bounds()
+        self.steps += 1
+
+        self.schedule_next_frame()
+
+    def schedule_next_frame(self):
+        """Park the batch until the first frame any of its instances has work to do."""
+        running = self.current_action != self.HALTED
+        if not running.any():
+            globals.scheduler.sleep(self)  # Until new instances are spawned
+            return
+
+        frame = globals.frame_count
+        next_frame = max(int(self.wake_frame[running].min()), frame + 1)
+        if next_frame > frame + 1:
+            globals.scheduler.sleep(self, next_frame - frame)
+
+    def remove_disappeared(self):
+        if self.alive.all():
+            return
+
+        alive = self.alive
+        self.instance_x = self.instance_x[alive]
+        self.instance_y = self.instance_y[alive]
+        self.current_action = self.current_action[alive]
+        self.sleep_counter = self.sleep_counter[alive]
+        self.wake_frame = self.wake_frame[alive]
+        self.variables = self.variables[alive]
+        self.spawn_frame = self.spawn_frame[alive]
+        self.alive = self.alive[alive]
+
+    def update_bounds(self):
+        """Write the instances back to the collision grid in bulk, as one rectangle covering all of them."""
+        model_bounds = globals.collision_grid.local_bounds(self.program)
+        if not self.instance_count or model_bounds is None:
+            bounds = None
+        else:
+            left, top = int(self.instance_x.min()) + model_bounds[0], int(self.instance_y.min()) + model_bounds[1]
+            bounds = (left, top, int(self.instance_x.max()) + model_bounds[2] - left, int(self.instance_y.max()) + model_bounds[3] - top)
+
+        if bounds == self.bounds:
+            return
+
+        self.bounds = bounds
+        self.squares = [Square(*bounds, (0, 0, 0), invisible=True)] if bounds else []
+        if self.registered:
+            globals.collision_grid.register(self)
+
+    def visible_instances(self, sprite):
+        """Screen positions (raw pixels) of the instances whose sprite intersects the camera view."""
+        camera = globals.camera
+        view_x = self.instance_x + sprite.offset_x - camera.x
+        view_y = self.instance_y + sprite.offset_y - camera.y
+        width, height = sprite.surface.get_size()
+        size = settings.pixel_size
+        visible = (view_x * size < camera.width * size) & (view_x * size + width > 0) & \
+            (view_y * size < camera.height * size) & (view_y * size + height > 0)
+        return view_x[visible] * size, view_y[visible] * size
+
+    def screen_rect(self):
+        sprite = sprite_cache.get(self.program.squares)
+        if sprite is None or not self.instance_count:
+            return None
+
+        screen_x, screen_y = self.visible_instances(sprite)
+        if not len(screen_x):
+            return None
+
+        width, height = sprite.surface.get_size()
+        left, top = int(screen_x.min()), int(screen_y.min())
+        return pygame.Rect(left, top, int(screen_x.max()) + width - left, int(screen_y.max()) + height - top)
+
+    def draw_state(self):
+        return self.screen_rect(), self.steps
+
+    def draw_snapshot(self, snapshot):
+        snapshot.add_many(self.program.squares, self.instance_x, self.instance_y)
+
+    def draw(self, surface):
+        """Draw every visible instance with the program's shared sprite in one blits call."""
+        sprite = sprite_cache.get(self.program.squares)
+        if sprite is None or not self.instance_count:
+            return
+
+        screen_x, screen_y = self.visible_instances(sprite)
+        surface.blits([(sprite.surface, position) for position in zip(screen_x.tolist(), screen_y.tolist())], doreturn=False)
+
+class BatchInterpreter:
+    """Runs the instances of each compiled program together, in one registered ProgramBatch per program."""
+
+    def __init__(self):
+        self.batches = {}
+
+    def batch_for(self, program):
+        batch = self.batches.get(program)
+        if batch is None or not batch.registered:
+            batch = ProgramBatch(program, self)
+            batch.register()
+            self.batches[program] = batch
+
+        return batch
+
+    def spawn(self, program, x, y):
+        """Spawn one instance of program at (x, y)."""
+        self.batch_for(program).spawn([x], [y])
@@ -1,7 +1,14 @@
+import hashlib
+import json
 from typing import List, Union, Optional, Dict, Any
 from pydantic import BaseModel, ValidationError
 from game_object import GameObject
 from square import Square
+from global_objects import globals
+from definitions import trace_levels, validation_modes
+from settings import settings
+from tracing import tracer
+from object_pool import ObjectPool
 
 ValueType = Union[int, str]
 
@@ -46,115 +53,249 @@ class IfGtAction(Action):
     true: Optional[str] = None
     false: Optional[str] = None
 
-# Wrapper classes for each action, with execute hooks
+# Wrapper classes for each action, with execute hooks.
+# Wrappers are compiled once per program and shared by all its instances, so they hold no
+# per-instance state: everything an instance owns lives on the CustomEventObject passed to execute.
 class ActionWrapper:
-    def __init__(self, model: Action, event_object):
+    def __init__(self, model: Action):
         self.model = model
-        self.event_object = event_object
 
-    def execute(self):
+    def execute(self, event_object):
         # By default, go to the next command
-        self.event_object.set_current_action(self.model.next)
-        return self.event_object.execute_current_action()
+        event_object.set_current_action(self.model.next)
+        return event_object.execute_current_action()
+
+    def execute_batch(self, batch, indices):
+        """
+        Execute the action for the batch instances at indices (see ProgramBatch).
+
+        Returns:
+            The indices that keep executing actions this frame.
+        """
+        # By default, go to the next command
+        batch.set_current_action(indices, self.model.next)
+        return batch.running(indices)
 
 # Define wrappers for each specific action type
 class SleepActionWrapper(ActionWrapper):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def execute(self, event_object):
+        duration = event_object.get_value(self.model.duration)
 
-        self.counter = 0
+        if event_object.sleep_counter == duration:
+            # Woken by the scheduler once the sleep is over
+            event_object.sleep_counter = 0
+            return super().execute(event_object)
 
-    def execute(self):
-        print(f"Sleeping for {self.counter} out of {self.model.duration} frames.")
+        if tracer.level >= trace_levels.DEBUG:
+            tracer.record(event_object.id, event_object.current_key, 'sleep', duration=duration)
 
-        if self.counter == self.model.duration:
-            self.counter = 0
-            return super().execute()
-        
-        self.counter += 1
+        # Park the object until the sleep is over instead of counting every frame
+        event_object.sleep_counter = duration
+        globals.scheduler.sleep(event_object, duration)
         return
 
+    def execute_batch(self, batch, indices):
+        durations = batch.get_values(self.model.duration, indices)
+        done = batch.sleep_counter[indices] == durations
+
+        finished = indices[done]
+        batch.sleep_counter[finished] = 0
+
+        batch.sleep(indices[~done], durations[~done])
+        return super().execute_batch(batch, finished)
+
 class MoveActionWrapper(ActionWrapper):
-    def execute(self):
-        print(f"Moving by x: {self.model.x}, y: {self.model.y}")
+    def execute(self, event_object):
+        if tracer.level >= trace_levels.DEBUG:
+            tracer.record(event_object.id, event_object.current_key, 'move', x=self.model.x, y=self.model.y)
+
+        # Event objects are not collidable, so they move without collision checks
+        event_object.move(self.model.x, self.model.y)
 
-        self.event_object.move(self.model.x, self.model.y)
+        return super().execute(event_object)
 
-        return super().execute()
+    def execute_batch(self, batch, indices):
+        # Batched objects are never collidable, so they move without collision checks
+        batch.instance_x[indices] += batch.get_values(self.model.x, indices)
+        batch.instance_y[indices] += batch.get_values(self.model.y, indices)
+
+        return super().execute_batch(batch, indices)
 
 class DisappearActionWrapper(ActionWrapper):
-    def execute(self):
-        self.event_object.unregister()
+    def execute(self, event_object):
+        if tracer.level >= trace_levels.INFO:
+            tracer.record(event_object.id, event_object.current_key, 'disappear')
+
+        event_object.unregister()
         return
 
+    def execute_batch(self, batch, indices):
+        batch.disappear(indices)
+        return indices[:0]
+
 class CreateObjectActionWrapper(ActionWrapper):
-    def execute(self):
-        print(f"Creating object with event_object: {self.model.event_object}")
+    def __init__(self, model: Action):
+        super().__init__(model)
+
+        # Compile the child program with its parent, so spawning it never parses anything
+        self.program = compile_program(self.model.event_object)
+
+    def execute(self, event_object):
+        if tracer.level >= trace_levels.INFO:
+            tracer.record(event_object.id, event_object.current_key, 'create_object', type=self.program.type)
+
+        event_object.create_subobject(self.program)
+
+        return super().execute(event_object)
 
-        self.event_object.create_subobject(self.model.event_object)
+    def execute_batch(self, batch, indices):
+        batch.create_subobjects(self.program, indices)
 
-        return super().execute()
+        return super().execute_batch(batch, indices)
 
 class SetVariableActionWrapper(ActionWrapper):
-    def execute(self):
-        print(f"Setting variable {self.model.name} to {self.model.value}")
+    def execute(self, event_object):
+        if tracer.level >= trace_levels.DEBUG:
+            tracer.record(event_object.id, event_object.current_key, 'set_variable', name=self.model.name, value=event_object.get_value(self.model.value))
 
-        self.event_object.variables[self.model.name] = self.event_object.get_value(self.model.value)
+        event_object.variables[self.model.name] = event_object.get_value(self.model.value)
 
-        return super().execute()
+        return super().execute(event_object)
+
+    def execute_batch(self, batch, indices):
+        batch.set_variable(self.model.name, indices, batch.get_values(self.model.value, indices))
+
+        return super().execute_batch(batch, indices)
 
 class AddValueActionWrapper(ActionWrapper):
-    def execute(self):
-        print(f"Adding {self.model.value1} and {self.model.value2} into {self.model.dest_name}")
+    def execute(self, event_object):
+        if tracer.level >= trace_levels.DEBUG:
+            tracer.record(event_object.id, event_object.current_key, 'add_value', dest_name=self.model.dest_name,
+                          value1=event_object.get_value(self.model.value1), value2=event_object.get_value(self.model.value2))
+
+        event_object.variables[self.model.dest_name] = event_object.get_value(self.model.value1) + event_object.get_value(self.model.value2)
+
+        return super().execute(event_object)
 
-        self.event_object.variables[self.model.dest_name] = self.event_object.get_value(self.model.value1) + self.event_object.get_value(self.model.value2)
+    def execute_batch(self, batch, indices):
+        batch.set_variable(self.model.dest_name, indices,
+                           batch.get_values(self.model.value1, indices) + batch.get_values(self.model.value2, indices))
 
-        return super().execute()
+        return super().execute_batch(batch, indices)
 
 class IfEqActionWrapper(ActionWrapper):
-    def execute(self):
-        print(f"Checking if {self.model.value1} == {self.model.value2}")
+    def execute(self, event_object):
+        if tracer.level >= trace_levels.DEBUG:
+            tracer.record(event_object.id, event_object.current_key, 'if_eq',
+                          value1=event_object.get_value(self.model.value1), value2=event_object.get_value(self.model.value2))
 
-        if self.event_object.get_value(self.model.value1) == self.event_object.get_value(self.model.value2):
-            self.event_object.set_current_action(self.model.true)
+        if event_object.get_value(self.model.value1) == event_object.get_value(self.model.value2):
+            event_object.set_current_action(self.model.true)
 
         else:
-            self.event_object.set_current_action(self.model.false)
+            event_object.set_current_action(self.model.false)
         
-        return self.event_object.execute_current_action()
+        return event_object.execute_current_action()
+
+    def execute_batch(self, batch, indices):
+        condition = batch.get_values(self.model.value1, indices) == batch.get_values(self.model.value2, indices)
+
+        batch.set_current_action(indices[condition], self.model.true)
+        batch.set_current_action(indices[~condition], self.model.false)
+        return batch.running(indices)
 
 class IfGtActionWrapper(ActionWrapper):
-    def execute(self):
-        print(f"Checking if {self.model.value1} > {self.model.value2}")
+    def execute(self, event_object):
+        if tracer.level >= trace_levels.DEBUG:
+            tracer.record(event_object.id, event_object.current_key, 'if_gt',
+                          value1=event_object.get_value(self.model.value1), value2=event_object.get_value(self.model.value2))
 
-        if self.event_object.get_value(self.model.value1) > self.event_object.get_value(self.model.value2):
-            self.event_object.set_current_action(self.model.true)
+        if event_object.get_value(self.model.value1) > event_object.get_value(self.model.value2):
+            event_object.set_current_action(self.model.true)
 
         else:
-            self.event_object.set_current_action(self.model.false)
+            event_object.set_current_action(self.model.false)
         
-        return self.event_object.execute_current_action()
+        return event_object.execute_current_action()
+
+    def execute_batch(self, batch, indices):
+        condition = batch.get_values(self.model.value1, indices) > batch.get_values(self.model.value2, indices)
+
+        batch.set_current_action(indices[condition], self.model.true)
+        batch.set_current_action(indices[~condition], self.model.false)
+        return batch.running(indices)
 
 # Factory method to create wrappers based on action type
-def create_action_wrapper(action_model: Action, event_object) -> ActionWrapper:
+def create_action_wrapper(action_model: Action) -> ActionWrapper:
     if action_model.type == "sleep":
-        return SleepActionWrapper(action_model, event_object)
+        return SleepActionWrapper(action_model)
     elif action_model.type == "move":
-        return MoveActionWrapper(action_model, event_object)
+        return MoveActionWrapper(action_model)
     elif action_model.type == "disappear":
-        return DisappearActionWrapper(action_model, event_object)
+        return DisappearActionWrapper(action_model)
     elif action_model.type == "create_object":
-        return CreateObjectActionWrapper(action_model, event_object)
+        return CreateObjectActionWrapper(action_model)
     elif action_model.type == "set_variable":
-        return SetVariableActionWrapper(action_model, event_object)
+        return SetVariableActionWrapper(action_model)
     elif action_model.type == "add_value":
-        return AddValueActionWrapper(action_model, event_object)
+        return AddValueActionWrapper(action_model)
     elif action_model.type == "if_eq":
-        return IfEqActionWrapper(action_model, event_object)
+        return IfEqActionWrapper(action_model)
     elif action_model.type == "if_gt":
-        return IfGtActionWrapper(action_model, event_object)
+        return IfGtActionWrapper(action_model)
     else:
-        return ActionWrapper(action_model, event_object)  # Fallback for unhandled actions
+        return ActionWrapper(action_model)  # Fallback for unhandled actions
+
+# Trusted validation mode: id(description) -> (description, model), the description is kept alive so
+# its id is not reused, and (model class, content hash) -> model
+models_by_id = {}
+models_by_content = {}
+# id -> EventObject of the EventObjects validated in trusted mode, compiled without a content key
+trusted_event_objects = {}
+
+def description_hash(data):
+    """Hash of a description (nested dicts and lists of JSON values), for the trusted mode memo."""
+    return hashlib.sha1(repr(data).encode()).digest()
+
+def parse_model(model_class, data):
+    """
+    Validate a description as a model_class.
+
+    In trusted mode (settings.ability_validation) each description is validated only once: parsing the
+    same dict again, or an equal one, returns the model validated the first time. Models are never modified
+    after parsing, so they can be shared, and a shared EventObject finds its compiled program by identity.
+    Strict mode validates every time and keeps nothing, for abilities from untrusted sources such as a
+    stream of generated ones, which would only fill the memo with descriptions parsed once.
+
+    Raises:
+        ValidationError: If the description is not a valid model_class.
+    """
+    if settings.ability_validation != validation_modes.TRUSTED:
+        return model_class.parse_obj(data)
+
+    cached = models_by_id.get(id(data))
+    if cached is not None and cached[0] is data and type(cached[1]) is model_class:
+        return cached[1]
+
+    key = (model_class, description_hash(data))
+    model = models_by_content.get(key)
+    if model is None:
+        model = model_class.parse_obj(data)
+        models_by_content[key] = model
+
+        # Abilities and create_object actions validate the EventObject they hold along with them
+        event_object = model if isinstance(model, EventObject) else getattr(model, 'event_object', None)
+        if event_object is not None:
+            trusted_event_objects[id(event_object)] = event_object
+
+    models_by_id[id(data)] = (data, model)
+    return model
+
+def forget_models():
+    """Forget the models validated in trusted mode, so they are validated again."""
+    models_by_id.clear()
+    models_by_content.clear()
+    trusted_event_objects.clear()
 
 # Function to parse action models separately
 def parse_action_models(action_dict: Dict[str, Dict[str, Any]]) -> Dict[str, Action]:
@@ -163,23 +304,23 @@ def parse_action_models(action_dict: Dict[str, Dict[str, Any]]) -> Dict[str, Act
         action_type = action_data.get("type")
         try:
             if action_type == "sleep":
-                parsed_actions[key] = SleepAction.parse_obj(action_data)
+                parsed_actions[key] = parse_model(SleepAction, action_data)
             elif action_type == "move":
-                parsed_actions[key] = MoveAction.parse_obj(action_data)
+                parsed_actions[key] = parse_model(MoveAction, action_data)
             elif action_type == "disappear":
-                parsed_actions[key] = DisappearAction.parse_obj(action_data)
+                parsed_actions[key] = parse_model(DisappearAction, action_data)
             elif action_type == "create_object":
-                parsed_actions[key] = CreateObjectAction.parse_obj(action_data)
+                parsed_actions[key] = parse_model(CreateObjectAction, action_data)
             elif action_type == "set_variable":
-                parsed_actions[key] = SetVariableAction.parse_obj(action_data)
+                parsed_actions[key] = parse_model(SetVariableAction, action_data)
             elif action_type == "add_value":
-                parsed_actions[key] = AddValueAction.parse_obj(action_data)
+                parsed_actions[key] = parse_model(AddValueAction, action_data)
             elif action_type == "if_eq":
-                parsed_actions[key] = IfEqAction.parse_obj(action_data)
+                parsed_actions[key] = parse_model(IfEqAction, action_data)
             elif action_type == "if_gt":
-                parsed_actions[key] = IfGtAction.parse_obj(action_data)
+                parsed_actions[key] = parse_model(IfGtAction, action_data)
             else:
-                parsed_actions[key] = Action.parse_obj(action_data)  # Fallback for unknown types
+                parsed_actions[key] = parse_model(Action, action_data)  # Fallback for unknown types
         except ValidationError as e:
             print(f"Error parsing action '{key}': {e}")
     return parsed_actions
@@ -212,24 +353,133 @@ class Ability(BaseModel):
     trigger: Trigger
     event_object: EventObject
 
+# A compiled, immutable EventObject: parsed actions, their wrappers and the model's squares.
+# Compiled once per description and shared by every CustomEventObject spawned from it.
+class Program:
+    def __init__(self, event_object_description: EventObject):
+        self.description = event_object_description
+        self.type = event_object_description.type
+
+        # Shared by all instances, which never modify their squares
+        self.squares = [square.to_square() for square in event_object_description.model]
+
+        self.actions = {}
+        for action_key, action_model in parse_action_models(event_object_description.actions).items():
+            self.actions[action_key] = create_action_wrapper(action_model)
+
+    def __reduce__(self):
+        # Pickled as its description, and unpickled as the compiled program of that description in this
+        # process, so world snapshots keep sharing programs with everything compiled after loading
+        return load_program, (content_key(self.description),)
+
+# id(description) -> (description, program), the description is kept alive so its id is not reused
+program_cache_by_id = {}
+# JSON of the description -> program, so separately parsed but identical descriptions share a program
+program_cache_by_content = {}
+# Programs compiled in trusted mode, not in program_cache_by_content until a content key is needed
+unkeyed_programs = []
+
+def compile_program(event_object_description: EventObject) -> Program:
+    """Return the compiled program of an EventObject, compiling it only the first time it is seen."""
+    if isinstance(event_object_description, Program):
+        return event_object_description
+
+    cached = program_cache_by_id.get(id(event_object_description))
+    if cached is not None and cached[0] is event_object_description:
+        return cached[1]
+
+    if trusted_event_objects.get(id(event_object_description)) is event_object_description:
+        # Equal descriptions are one model in trusted mode (see parse_model), which makes the content key
+        # (a JSON dump of the whole create_object tree) the bulk of compiling, so it is left for later.
+        # Descriptions from anywhere else (e.g. a world snapshot) still go by content
+        program = Program(event_object_description)
+        unkeyed_programs.append(program)
+    else:
+        key_unkeyed_programs()
+        key = content_key(event_object_description)
+        program = program_cache_by_content.get(key)
+        if program is None:
+            program = Program(event_object_description)
+            program_cache_by_content[key] = program
+
+    program_cache_by_id[id(event_object_description)] = (event_object_description, program)
+    return program
+
+def content_key(event_object_description: EventObject):
+    return json.dumps(event_object_description.dict(), sort_keys=True)
+
+def key_unkeyed_programs():
+    """Add the programs compiled in trusted mode to program_cache_by_content, before looking anything up there."""
+    for program in unkeyed_programs:
+        program_cache_by_content.setdefault(content_key(program.description), program)
+    unkeyed_programs.clear()
+
+def load_program(key):
+    """Compiled program of the description with the given content_key."""
+    key_unkeyed_programs()
+    program = program_cache_by_content.get(key)
+    if program is None:
+        program = compile_program(parse_model(EventObject, json.loads(key)))
+    return program
+
+def restore_program(key, state):
+    """Program unpickled by value (see ability_cache.py), or the program already compiled from the same description."""
+    key_unkeyed_programs()
+    program = program_cache_by_content.get(key)
+    if program is None:
+        program = Program.__new__(Program)
+        program.__dict__.update(state)
+        program_cache_by_content[key] = program
+
+    program_cache_by_id[id(state['description'])] = (state['description'], program)
+    return program
+
 class CustomEventObject(GameObject):
+    __slots__ = ('program', 'event_object_description', 'variables', 'sleep_counter', 'current_key')
+
     def __init__(self, event_object_description, original_game_object):
-        self.event_object_description = event_object_description
-        self.action_descriptions = parse_action_models(self.event_object_description.actions)
+        """
+        Spawn an instance of an event object at the position of the object that created it.
+
+        Args:
+            event_object_description (EventObject or Program): What to spawn, compiled on first use.
+            original_game_object (GameObject): The object creating this one.
+        """
+        if isinstance(event_object_description, Program):
+            self.program = event_object_description
+        else:
+            self.program = compile_program(event_object_description)
 
-        event_object_model = self.event_object_description.model
-        squares = [square.to_square() for square in event_object_model]
+        self.event_object_description = self.program.description
 
-        super().__init__(original_game_object.x, original_game_object.y, squares, self.event_object_description.type, collidable=False)
+        super().__init__(original_game_object.x, original_game_object.y, self.program.squares, self.program.type, collidable=False)
 
+        # Per-instance state, everything else is shared through the program
         self.variables = {}
-        self.actions = {}
+        self.sleep_counter = 0
+        self.current_key = 'entry'
 
-        for action_key, action_model in self.action_descriptions.items():
-            self.actions[action_key] = create_action_wrapper(action_model, self)
+    def reset(self, event_object_description, original_game_object):
+        if isinstance(event_object_description, Program):
+            program = event_object_description
+        else:
+            program = compile_program(event_object_description)
 
+        if program is not self.program:
+            self.program = program
+            self.event_object_description = program.description
+            self.squares = program.squares
+            self.type = program.type
+
+        super().reset(original_game_object.x, original_game_object.y)
+
+        self.variables.clear()
+        self.sleep_counter = 0
         self.current_key = 'entry'
 
+    def state(self):
+        return self.x, self.y, self.current_key, self.sleep_counter, sorted(self.variables.items())
+
     def on_frame(self, events, keys_pressed):
         self.execute_current_action()
 
@@ -237,7 +487,7 @@ class CustomEventObject(GameObject):
         self.current_key = new_action_key
 
     def execute_current_action(self):
-        self.actions[self.current_key].execute()
+        self.program.actions[self.current_key].execute(self)
 
     def get_value(self, value: ValueType):
         if type(value) == str:
@@ -246,6 +496,8 @@ class CustomEventObject(GameObject):
         return value
     
     def create_subobject(self, event_object_description):
-        CustomEventObject(event_object_description, self).register()
+        CustomEventObject.pool.acquire(event_object_description, self).register()
+
+CustomEventObject.pool = ObjectPool(CustomEventObject)
 
 CreateObjectAction.update_forward_refs()
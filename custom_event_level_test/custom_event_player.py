@@ -1,22 +1,36 @@
 from general_objects.player import Player
-from custom_event_engine.custom_event_engine import Ability, CustomEventObject
+from custom_event_engine.custom_event_engine import CustomEventObject, compile_program
+from custom_event_engine.ability_cache import load_ability
+from custom_event_engine.batch_interpreter import BatchInterpreter
 from custom_event_level_test.ability1 import ability_desc as ability_desc1
 from custom_event_level_test.ability2 import ability_desc as ability_desc2
 
+# Run the spawned event objects together in one batch per program instead of as one object each
+USE_BATCH_INTERPRETER = True
+
 class CustomEventPlayer(Player):
     def __init__(self):
         super().__init__()
 
         self.ability_desc = ability_desc2
 
-        self.ability = Ability.parse_obj(self.ability_desc)
+        self.ability = load_ability(self.ability_desc)
 
         self.counter = 0
 
+        self.interpreter = BatchInterpreter() if USE_BATCH_INTERPRETER else None
+
         # self.custom_events = []
 
     def on_frame(self, events, keys_pressed):
         self.counter += 1
 
         if self.counter % 30 == 0:
-            CustomEventObject(self.ability.event_object, self).register()
+            self.cast(self.ability.event_object)
+
+    def cast(self, event_object):
+        """Spawn an instance of an event object (description or compiled Program) at the player."""
+        if self.interpreter is not None:
+            self.interpreter.spawn(compile_program(event_object), self.x, self.y)
+        else:
+            CustomEventObject.pool.acquire(event_object, self).register()
@@ -9,3 +9,14 @@ class object_types:
     PARTICLE = 'PARTICLE'
     BACKGROUND = 'BACKGROUND'
     BARRIER = 'BARRIER'
+
+
+class trace_levels:
+    OFF = 0
+    INFO = 1  # Spawning, disappearing and other rare events
+    DEBUG = 2  # Every executed action, every frame
+
+
+class validation_modes:
+    STRICT = 'STRICT'  # Validate every description parsed, for untrusted (e.g. generated) abilities
+    TRUSTED = 'TRUSTED'  # Validate each distinct description once, then reuse the validated model
@@ -20,7 +20,7 @@ class Background(GameObject):
 
         background_model = background_color_square + small_dirt + big_dirt
 
-        super().__init__(0, 0, background_model, type=object_types.BACKGROUND, collidable=False)
+        super().__init__(0, 0, background_model, type=object_types.BACKGROUND, collidable=False, static=True)
 
     def new_small_dirt(self):
         return Square(random.randint(0, settings.map_width), random.randint(0, settings.map_height), 1, 1, self.DIRT_COLOR)
@@ -15,4 +15,4 @@ class MapOutlineBarrier(GameObject):
         
         barriers = [top_barrier, bottom_barrier, left_barrier, right_barrier]
 
-        super().__init__(0, 0, barriers, type=object_types.BARRIER, collidable=True)
+        super().__init__(0, 0, barriers, type=object_types.BARRIER, collidable=True, static=True)
@@ -1,19 +1,33 @@
-from definitions import object_types
+from definitions import object_types, trace_levels
 from settings import settings
 from game_object import GameObject
 from square import Square
+from object_pool import ObjectPool
+from tracing import tracer
 
 class Particle(GameObject):
+    __slots__ = ('speed_x', 'speed_y')
+
+    # Model shared by every particle
+    squares_model = [
+        Square(0, 0, 1, 1, (0, 125, 125))
+    ]
+
     def __init__(self, x, y, speed_x, speed_y):
-        squares = [
-            Square(0, 0, 1, 1, (0, 125, 125))
-        ]
+        super().__init__(x, y, self.squares_model, type=object_types.PARTICLE)
+
+        self.speed_x = speed_x
+        self.speed_y = speed_y
 
-        super().__init__(x, y, squares, type=object_types.PARTICLE)
+    def reset(self, x, y, speed_x, speed_y):
+        super().reset(x, y)
 
         self.speed_x = speed_x
         self.speed_y = speed_y
 
+    def state(self):
+        return self.x, self.y, self.speed_x, self.speed_y
+
     def on_frame(self, events, keys_pressed):
         self.move(self.speed_x, self.speed_y)
 
@@ -21,15 +35,17 @@ class Particle(GameObject):
         if self.x < 0 or \
                 self.y > settings.map_height or \
                 self.y < 0:
-            print("unregistering a particle")
+            if tracer.level >= trace_levels.INFO:
+                tracer.record(self.id, None, 'left_map', x=self.x, y=self.y)
             self.unregister()
 
     def on_collision_active(self, other):
-        print(f"on particle collision {self.id}")
+        if tracer.level >= trace_levels.DEBUG:
+            tracer.record(self.id, None, 'collision', other=other.id)
         if other.type == object_types.PLAYER:
             self.unregister()
             return False
 
         return super().on_collision_active(other)
 
-    
+Particle.pool = ObjectPool(Particle)
@@ -0,0 +1,222 @@
+import time
+import numpy as np
+import pygame
+from definitions import object_types, trace_levels
+from settings import settings
+from global_objects import globals
+from game_object import GameObject
+from square import Square
+from tracing import tracer
+from profiler import profiler
+
+class ParticleEmitter(GameObject):
+    """
+    Struct-of-arrays particle system: one GameObject that steps, collides, culls and draws any number
+    of 1x1 particles with NumPy instead of one Particle object per particle.
+
+    Particles behave like Particle objects: they move by their speed every frame, are removed when they
+    hit the player or leave the map (except to the right), and trigger on_collision_passive on the first
+    collidable object they hit. They do not collide with each other.
+    """
+
+    COLOR = (0, 125, 125)
+    COLORKEYS = [(255, 0, 255), (0, 255, 255), (255, 255, 0), (1, 2, 3)]
+    FILL_DRAW_LIMIT = 256  # Above this many visible particles they are drawn with one scaled blit
+
+    def __init__(self):
+        # A single invisible square spanning the map puts the emitter in every grid bucket, so it is
+        # always found by the camera query; it is not collidable, so nothing ever collides with it
+        bounds = [Square(0, 0, settings.map_width, settings.map_height, self.COLOR, invisible=True)]
+
+        super().__init__(0, 0, bounds, type=object_types.PARTICLE, collidable=False)
+
+        # One entry per live particle
+        self.particle_x = np.zeros(0, dtype=np.int32)
+        self.particle_y = np.zeros(0, dtype=np.int32)
+        self.speed_x = np.zeros(0, dtype=np.int32)
+        self.speed_y = np.zeros(0, dtype=np.int32)
+        self.colors = np.zeros((0, 3), dtype=np.uint8)
+
+        self.steps = 0  # Changes whenever the particles do, for dirty-rectangle rendering
+
+    @property
+    def particle_count(self):
+        return len(self.particle_x)
+
+    def emit(self, x, y, speed_x, speed_y, color=None):
+        """Add one particle, like registering a new Particle(x, y, speed_x, speed_y)."""
+        self.emit_many([x], [y], [speed_x], [speed_y], [color if color else self.COLOR])
+
+    def emit_many(self, xs, ys, speed_xs, speed_ys, colors=None):
+        """Add a batch of particles from equally long sequences (colors default to COLOR)."""
+        if colors is None:
+            colors = np.tile(np.array(self.COLOR, dtype=np.uint8), (len(xs), 1))
+
+        self.particle_x = np.concatenate([self.particle_x, np.asarray(xs, dtype=np.int32)])
+        self.particle_y = np.concatenate([self.particle_y, np.asarray(ys, dtype=np.int32)])
+        self.speed_x = np.concatenate([self.speed_x, np.asarray(speed_xs, dtype=np.int32)])
+        self.speed_y = np.concatenate([self.speed_y, np.asarray(speed_ys, dtype=np.int32)])
+        self.colors = np.concatenate([self.colors, np.asarray(colors, dtype=np.uint8).reshape(-1, 3)])
+        self.steps += 1
+
+    def keep(self, alive):
+        """Drop every particle whose entry in the boolean mask is False."""
+        self.particle_x = self.particle_x[alive]
+        self.particle_y = self.particle_y[alive]
+        self.speed_x = self.speed_x[alive]
+        self.speed_y = self.speed_y[alive]
+        self.colors = self.colors[alive]
+
+    def state(self):
+        return (self.particle_x.tobytes(), self.particle_y.tobytes(), self.speed_x.tobytes(), self.speed_y.tobytes(),
+                self.colors.tobytes())
+
+    def on_frame(self, events, keys_pressed):
+        if not self.particle_count:
+            return
+
+        new_x = self.particle_x + self.speed_x
+        new_y = self.particle_y + self.speed_y
+
+        alive = np.ones(self.particle_count, dtype=bool)
+        start = time.perf_counter() if profiler.enabled else None
+        hit_indices, hit_objects = self.find_collisions(new_x, new_y)
+        if start is not None:
+            profiler.add('collision', time.perf_counter() - start)
+        for index, other in zip(hit_indices.tolist(), hit_objects):
+            alive[index] = self.on_particle_collision(index, other)
+            other.on_collision_passive(self)
+
+        self.particle_x = new_x
+        self.particle_y = new_y
+
+        # Allows being to the right of the map, otherwise if it is outside of the map removes itself
+        alive &= (new_x >= 0) & (new_y >= 0) & (new_y <= settings.map_height)
+
+        if tracer.level >= trace_levels.INFO:
+            for index in np.nonzero(~alive)[0].tolist():
+                tracer.record(self.id, None, 'particle_removed', x=int(new_x[index]), y=int(new_y[index]))
+
+        self.keep(alive)
+        self.steps += 1
+
+    def on_particle_collision(self, index, other):
+        """Called for a particle hitting other, returns whether the particle survives."""
+        if tracer.level >= trace_levels.DEBUG:
+            tracer.record(self.id, None, 'collision', particle=index, other=other.id)
+
+        return other.type != object_types.PLAYER
+
+    def find_collisions(self, new_x, new_y):
+        """
+        Test every particle's destination against the collision grid in bulk.
+
+        Particles are grouped by grid bucket, and each bucket's collidable objects are tested in the
+        bucket's order against all of its particles at once, so each particle reports the same first
+        hit a Particle's check_collision would.
+
+        Returns:
+            (indices, objects): the particles that hit something and the first object each one hit.
+        """
+        grid = globals.collision_grid
+        bucket_x = new_x // grid.bucket_size
+        bucket_y = new_y // grid.bucket_size
+
+        # Sort particles by a single integer key per bucket, then walk each bucket's run of particles
+        first_x, first_y = int(bucket_x.min()), int(bucket_y.min())
+        span_y = int(bucket_y.max()) - first_y + 1
+        keys = (bucket_x - first_x).astype(np.int64) * span_y + (bucket_y - first_y)
+        by_bucket = np.argsort(keys, kind='stable')
+        sorted_keys = keys[by_bucket]
+        starts = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]]))
+        ends = np.append(starts[1:], len(keys))
+
+        hit_indices = []
+        hit_objects = []
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            key = int(sorted_keys[start])
+            cell = grid.grid.get((key // span_y + first_x, key % span_y + first_y))
+            if not cell:
+                continue
+
+            remaining = by_bucket[start:end]
+            for other in cell:
+                if not other.collidable or other is self or not len(remaining):
+                    continue
+
+                particle_x = new_x[remaining]
+                particle_y = new_y[remaining]
+                hit = np.zeros(len(remaining), dtype=bool)
+                for square in other.squares:
+                    left = other.x + square.offset_x
+                    top = other.y + square.offset_y
+                    hit |= (particle_x >= left) & (particle_x < left + square.width) & \
+                        (particle_y >= top) & (particle_y < top + square.height)
+
+                if hit.any():
+                    hit_indices.append(remaining[hit])
+                    hit_objects.extend([other] * int(hit.sum()))
+                    remaining = remaining[~hit]
+
+        if grid.counters is not None:
+            grid.counters.probes += len(starts)
+            grid.counters.callbacks += sum(len(indices) for indices in hit_indices)
+
+        if not hit_indices:
+            return np.zeros(0, dtype=np.intp), []
+
+        # Report hits in particle order, like Particle objects running one after the other
+        hit_indices = np.concatenate(hit_indices)
+        order = np.argsort(hit_indices, kind='stable')
+        return hit_indices[order], [hit_objects[i] for i in order.tolist()]
+
+    def visible_particles(self):
+        """Camera-relative positions and colors of the particles inside the camera view."""
+        camera = globals.camera
+        view_x = self.particle_x - camera.x
+        view_y = self.particle_y - camera.y
+        visible = (view_x >= 0) & (view_x < camera.width) & (view_y >= 0) & (view_y < camera.height)
+        return view_x[visible], view_y[visible], self.colors[visible]
+
+    def screen_rect(self):
+        """Bounding box of the visible particles in raw screen pixels, or None if none is visible."""
+        view_x, view_y, _ = self.visible_particles()
+        if not len(view_x):
+            return None
+
+        left, top = int(view_x.min()), int(view_y.min())
+        return pygame.Rect(left * settings.pixel_size, top * settings.pixel_size,
+                           (int(view_x.max()) - left + 1) * settings.pixel_size,
+                           (int(view_y.max()) - top + 1) * settings.pixel_size)
+
+    def draw_state(self):
+        return self.screen_rect(), self.steps
+
+    def draw_snapshot(self, snapshot):
+        view_x, view_y, colors = self.visible_particles()
+        snapshot.add_pixels(view_x + globals.camera.x, view_y + globals.camera.y, colors)
+
+    def draw(self, surface):
+        """Draw all visible particles with a single scaled blit."""
+        view_x, view_y, colors = self.visible_particles()
+        if not len(view_x):
+            return
+
+        if len(view_x) <= self.FILL_DRAW_LIMIT:
+            # Few particles are cheaper to fill one by one than to build and scale a view-sized surface
+            size = settings.pixel_size
+            for x, y, color in zip(view_x.tolist(), view_y.tolist(), colors.tolist()):
+                surface.fill(color, (x * size, y * size, size, size))
+            return
+
+        # Colorkey the empty pixels with a color no particle uses
+        colorkey = next(key for key in self.COLORKEYS if not np.all(colors == key, axis=1).any())
+
+        camera = globals.camera
+        pixels = np.empty((camera.width, camera.height, 3), dtype=np.uint8)
+        pixels[:] = colorkey
+        pixels[view_x, view_y] = colors
+
+        particles_surface = pygame.surfarray.make_surface(pixels)
+        particles_surface.set_colorkey(colorkey)
+        surface.blit(pygame.transform.scale(particles_surface, (camera.width * settings.pixel_size, camera.height * settings.pixel_size)), (0, 0))
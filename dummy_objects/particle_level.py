@@ -3,11 +3,15 @@ from settings import settings
 from general_objects.level import Level
 from dummy_objects.particle_player import ParticlePlayer
 from dummy_objects.particle import Particle
+from dummy_objects.particle_emitter import ParticleEmitter
 from dummy_objects.background import Background
 from dummy_objects.map_outline_barrier import MapOutlineBarrier
 from game_object import GameObject
 
 class ParticleLevel(Level):
+    # Simulate particles in bulk with a ParticleEmitter instead of one Particle object each
+    USE_PARTICLE_EMITTER = True
+
     def __init__(self, screen):
         super().__init__(screen)
 
@@ -15,12 +19,24 @@ class ParticleLevel(Level):
 
         self.objects = [Background(), MapOutlineBarrier()]
 
+        self.emitter = ParticleEmitter() if self.USE_PARTICLE_EMITTER else None
+
         self.particle_delay = 1
         self.counter = 1
+
+    def start(self):
+        super().start()
+
+        # Registered after the player, so particles are drawn over it like Particle objects
+        if self.emitter is not None:
+            self.emitter.register()
       
     def on_frame(self, events, keys_pressed):
         if self.counter % self.particle_delay == 0:
             # Create a new particle at the top of the screen, moving downwards diagonally
-            Particle(random.randint(0, settings.map_width * 2), 0, -1, 1).register()
+            if self.emitter is not None:
+                self.emitter.emit(random.randint(0, settings.map_width * 2), 0, -1, 1)
+            else:
+                Particle.pool.acquire(random.randint(0, settings.map_width * 2), 0, -1, 1).register()
 
         self.counter += 1
@@ -1,23 +1,39 @@
-import pygame
-from uuid import uuid4
+import time
+from itertools import count
 from typing import List
 from definitions import object_types
 from settings import settings
 from global_objects import globals
-from square import Square
+from square import Square, model_version
+from sprite_cache import sprite_cache
+from profiler import profiler
 
-def draw_object(surface, x, y, squares: List[Square]):
-    for square in squares:
-        if square.invisible:
-            continue
+# Increasing registration stamps, objects are drawn in the order they were registered
+registration_counter = count()
 
-        pygame.draw.rect(surface, square.color, (
-            (x + square.offset_x) * settings.pixel_size,  # Convert to raw screen pixels
-            (y + square.offset_y) * settings.pixel_size,
-            square.width * settings.pixel_size, square.height * settings.pixel_size))  # Scale width and height
+# Object ids, never reused (pooled objects get a new one each time they are reset)
+id_counter = count()
 
 class GameObject:
-    def __init__(self, x, y, squares: List[Square], type=None, collidable=True):
+    """
+    Base of everything in a level.
+
+    The core fields use __slots__; transient subclasses that are spawned in bulk (Particle,
+    CustomEventObject) declare slots too and share their squares, so a Particle costs about 190 bytes
+    instead of about 440 (plus about 630 for its collision grid, scheduler and game_objects entries once
+    registered). benchmarks/memory.py measures these figures.
+    Subclasses without __slots__ simply get an instance dict as usual.
+    """
+
+    __slots__ = ('x', 'y', 'squares', 'type', 'collidable', 'static', 'id', 'registered', 'registration_order',
+                 'sprite', 'sprite_key', 'sprite_squares', 'sprite_version')
+
+    pool = None  # ObjectPool unregistered instances are released to, for classes that are pooled
+
+    # Slots only caching things, left out of world snapshots and reset to these values when loading one
+    CACHE_SLOTS = {'sprite': None, 'sprite_key': None, 'sprite_squares': None, 'sprite_version': -1}
+
+    def __init__(self, x, y, squares: List[Square], type=None, collidable=True, static=False):
         """
         Initialize a game object.
         
@@ -26,6 +42,7 @@ class GameObject:
             y (int): Y position in game-world pixel units.
             squares (list): List of squares defining the object.
             collidable (bool): Whether the object participates in collision detection.
+            static (bool): Whether the object never moves or changes, so levels can pre-render it once.
         """
 
         self.x = x  # Position in game-world pixel units
@@ -33,73 +50,190 @@ class GameObject:
         self.squares = squares  # Structure of the object as squares (with sizes)
         self.type = type if type else object_types.GENERIC
         self.collidable = collidable  # Collision flag
-        self.id = self.type + '-' + str(uuid4())
+        self.static = static  # Never moves or changes after registration
+        self.id = next(id_counter)
         self.registered = False
+        self.registration_order = 0
+
+        # Pre-rendered model, re-checked only when the squares list is replaced or any square changes
+        self.sprite = None
+        self.sprite_key = None
+        self.sprite_squares = None
+        self.sprite_version = -1
 
     def register(self):
         globals.collision_grid.register(self)
         globals.game_objects[self.id] = self
         self.registered = True
+        self.registration_order = next(registration_counter)
+        globals.scheduler.add(self)
 
     def unregister(self):
         globals.collision_grid.unregister(self)
+        globals.scheduler.remove(self)
         del globals.game_objects[self.id]
         self.registered = False
 
+        if self.pool is not None:
+            self.pool.release(self)
+
+    def reset(self, x, y):
+        """Reinitialize an unregistered pooled object for reuse, keeping its squares (see ObjectPool)."""
+        self.x = x
+        self.y = y
+        self.id = next(id_counter)
+        self.registered = False
+        self.registration_order = 0
+
     def update_position(self, new_x, new_y):
         if not self.registered:
             return
 
+        # Move the object's grid entries by only the buckets it enters and leaves
+        start = time.perf_counter() if profiler.enabled else None
+        globals.collision_grid.move(self, new_x, new_y)
+        if start is not None:
+            profiler.add('collision', time.perf_counter() - start)
+
         self.x = new_x
         self.y = new_y
 
-        # Register the object in the new grid position
-        globals.collision_grid.unregister(self)
-        globals.collision_grid.register(self)
+    def get_sprite(self):
+        """Return the cached sprite of the object's squares, re-rendering it if the model changed."""
+        version = model_version(self.squares)
+        if self.sprite_squares is not self.squares or self.sprite_version != version:
+            key = sprite_cache.model_key(self.squares)
+            if key != self.sprite_key:
+                self.sprite = sprite_cache.get(self.squares, key)
+                self.sprite_key = key
+
+            self.sprite_squares = self.squares
+            self.sprite_version = version
+
+        return self.sprite
+
+    def invalidate_sprite(self):
+        """Force the sprite to be re-checked, for changes the cache cannot see (e.g. appending to squares in place)."""
+        self.sprite_squares = None
 
     def draw(self, surface):
         """Draw the object using the camera offset."""
-        draw_object(surface, self.x - globals.camera.x, self.y - globals.camera.y, self.squares)
+        self.draw_at(surface, self.x - globals.camera.x, self.y - globals.camera.y)
+
+    def screen_rect(self):
+        """The screen area (in raw screen pixels) the object covers when drawn, or None if nothing is visible."""
+        sprite = self.get_sprite()
+        if sprite is None:
+            return None
+
+        return sprite.surface.get_rect(topleft=(
+            (self.x + sprite.offset_x - globals.camera.x) * settings.pixel_size,
+            (self.y + sprite.offset_y - globals.camera.y) * settings.pixel_size))
 
-    def move(self, dx, dy):
-        """Move the object by dx, dy in game-world pixel units."""
+    def draw_state(self):
+        """Everything that decides how the object looks on screen, compared between frames by dirty-rectangle rendering."""
+        return self.screen_rect(), self.get_sprite()
+
+    def state(self):
+        """Values making up the object's simulated state, hashed to compare runs (see replay.world_digest)."""
+        return self.x, self.y
+
+    def draw_snapshot(self, snapshot):
+        """Add what draw() would draw to a render snapshot (see pipeline.RenderSnapshot)."""
+        snapshot.add(self.squares, self.x, self.y)
+
+    def draw_at(self, surface, x, y):
+        """Draw the object with its origin at (x, y) of the surface, in game-world pixel units."""
+        sprite = self.get_sprite()
+        if sprite is None:
+            return  # Nothing visible
+
+        surface.blit(sprite.surface, (
+            (x + sprite.offset_x) * settings.pixel_size,  # Convert to raw screen pixels
+            (y + sprite.offset_y) * settings.pixel_size))
+
+    def move(self, dx, dy, swept=False):
+        """
+        Move the object by dx, dy in game-world pixel units.
+
+        By default only the destination is checked for collisions. With swept=True the whole path is
+        checked, so moves of more than one pixel cannot tunnel through thin objects, and the first
+        contact along the path is returned as (t, other) (None if the path was clear).
+        """
         if not self.collidable:
             # If not collidable, simply move without collision checks
+            start = time.perf_counter() if profiler.enabled else None
+            globals.collision_grid.move(self, self.x + dx, self.y + dy)
+            if start is not None:
+                profiler.add('collision', time.perf_counter() - start)
             self.x += dx
             self.y += dy
             return
 
-        # Unregister the object from the current grid
-        globals.collision_grid.unregister(self)
+        if swept:
+            return self.swept_move(dx, dy)
 
         # Calculate new position
         new_x = self.x + dx
         new_y = self.y + dy
 
-        # Check for collisions in the new position
+        # Check for collisions in the new position (the grid query skips this object's own entries)
         if self.check_collision(new_x, new_y):
-            # Collision occurred, re-register at the current position and exit
-            globals.collision_grid.register(self)
             return  # Cancel movement if a collision occurs
 
         # Apply the move if no collision
         self.update_position(new_x, new_y)
 
+    def swept_move(self, dx, dy):
+        """Move along the path, stopping before the first contact if it blocks us."""
+        start = time.perf_counter() if profiler.enabled else None
+        contact = globals.collision_grid.sweep(self, dx, dy)
+        if start is not None:
+            profiler.add('collision', time.perf_counter() - start)
+        if contact is None:
+            self.update_position(self.x + dx, self.y + dy)
+            return None
+
+        t, other = contact
+
+        # Trigger the collision callback
+        should_not_move = self.on_collision_active(other)
+        other.on_collision_passive(self)
+
+        if not should_not_move:
+            self.update_position(self.x + dx, self.y + dy)
+            return contact
+
+        # Stop where the path reaches other, rounded toward the start on each axis (int truncates toward zero,
+        # after rounding off float error so a contact at exactly a whole pixel is not a pixel short)
+        stop_x = self.x + int(round(dx * t, 9))
+        stop_y = self.y + int(round(dy * t, 9))
+
+        # Rounding each axis separately can leave the path on diagonal moves, step back until nothing overlaps
+        start = time.perf_counter() if profiler.enabled else None
+        while (stop_x, stop_y) != (self.x, self.y) and next(globals.collision_grid.query(self, stop_x, stop_y), None) is not None:
+            stop_x -= (stop_x > self.x) - (stop_x < self.x)
+            stop_y -= (stop_y > self.y) - (stop_y < self.y)
+        if start is not None:
+            profiler.add('collision', time.perf_counter() - start)
+
+        self.update_position(stop_x, stop_y)
+        return contact
+
     def check_collision(self, new_x, new_y):
         """Check if moving to the new position would cause a collision."""
-        for square in self.squares:
-            # Check for collision by looking at the grid positions that this square would occupy
-            for i in range(square.width):
-                for j in range(square.height):
-                    new_grid_pos = (new_x + square.offset_x + i, new_y + square.offset_y + j)
-                    if new_grid_pos in globals.collision_grid.grid:
-                        for other in globals.collision_grid.grid[new_grid_pos]:
-                            if other != self:
-                                # Trigger the collision callback
-                                should_not_move = self.on_collision_active(other)
-                                other.on_collision_passive(self)
-                                return should_not_move
-        return False
+        # Find the first object that this object's squares would overlap at the new position
+        start = time.perf_counter() if profiler.enabled else None
+        other = next(globals.collision_grid.query(self, new_x, new_y), None)
+        if start is not None:
+            profiler.add('collision', time.perf_counter() - start)
+        if other is None:
+            return False
+
+        # Trigger the collision callback
+        should_not_move = self.on_collision_active(other)
+        other.on_collision_passive(self)
+        return should_not_move
 
     def on_collision_active(self, other):
         """Callback when this object collides with another."""
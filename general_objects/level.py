@@ -1,44 +1,204 @@
+import pygame
+from settings import settings
 from global_objects import globals
+from object_pool import ObjectPool
+from profiler import profiler
 
 class Level:
     BLACK = (0, 0, 0)
 
+    # Attributes only rendering needs, left out of world snapshots and rebuilt after loading (see world_snapshot.py)
+    RENDER_STATE = ('screen', 'static_layer', 'static_objects', 'dirty_rects', 'drawn_objects', 'last_camera_position')
+
     def __init__(self, screen):
         self.running = False
         self.player = None
         self.objects = []
 
         self.screen = screen
-    
+
+        # Static objects pre-rendered into a map-sized surface at start, drawn underneath everything else
+        self.static_layer = None
+        self.static_objects = set()
+
+        # Objects drawn and skipped for being outside the camera view in the last frame
+        self.drawn_count = 0
+        self.culled_count = 0
+
+        # Dirty-rectangle rendering: screen areas changed by the last frame, or None if the whole screen was redrawn
+        self.dirty_rects = None
+        self.drawn_objects = {}  # Object -> draw state (screen rect first) it was last drawn with
+        self.last_camera_position = None
+        self.full_redraw_requested = True
+
+    def __getstate__(self):
+        return {name: value for name, value in self.__dict__.items() if name not in self.RENDER_STATE}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.screen = None
+        self.static_layer = None
+        self.static_objects = set()
+        self.dirty_rects = None
+        self.drawn_objects = {}
+        self.last_camera_position = None
+        self.full_redraw_requested = True
+
     def start(self):
         for obj in self.objects:
             obj.register()
 
         self.player.register()
-    
+
+        self.bake_static_layer()
+
     def end(self):
         # TODO: Maybe find a better way of handling dynamically created objects
         for obj in globals.game_objects:
             obj.unregister()
-    
+
+    def bake_static_layer(self):
+        """Render every registered static object once into a map-sized surface."""
+        self.static_objects = {obj for obj in globals.game_objects.values() if obj.static}
+        if not self.static_objects:
+            self.static_layer = None
+            return
+
+        self.static_layer = pygame.Surface((settings.map_width * settings.pixel_size, settings.map_height * settings.pixel_size))
+        self.static_layer.fill(self.BLACK)
+
+        # Keep registration order, so static objects overlap each other as they did when drawn every frame
+        for obj in globals.game_objects.values():
+            if obj in self.static_objects:
+                obj.draw_at(self.static_layer, obj.x, obj.y)
+
+    def draw_static_layer(self):
+        """Fill the screen with the part of the static layer the camera sees."""
+        if self.static_layer is None:
+            self.screen.fill(self.BLACK)
+            return
+
+        visible_area = pygame.Rect(
+            globals.camera.x * settings.pixel_size, globals.camera.y * settings.pixel_size,
+            globals.camera.width * settings.pixel_size, globals.camera.height * settings.pixel_size)
+
+        if not self.static_layer.get_rect().contains(visible_area):
+            self.screen.fill(self.BLACK)  # The camera sees past the map
+
+        self.screen.blit(self.static_layer, (0, 0), visible_area)
+
     def handle_frame(self, events, keys_pressed):
+        self.simulate(events, keys_pressed)
+        self.render()
+
+    def simulate(self, events, keys_pressed):
+        """Advance the level by one frame without drawing anything."""
+        globals.frame_count += 1
+
         # Handle player input
         self.player.handle_keys(keys_pressed)
+        if profiler.enabled:
+            profiler.mark('handle_keys')
 
         # Update the camera to follow the character
         globals.camera.update(self.player)
+        if profiler.enabled:
+            profiler.mark('camera')
 
         self.on_frame(events, keys_pressed)
 
-        for _, obj in list(globals.game_objects.items()):
+        # Objects parked by the scheduler (e.g. sleeping event objects) are skipped until they wake
+        for obj in globals.scheduler.due_objects():
             obj.on_frame(events, keys_pressed)
 
-        # Fill the screen with the background color
-        self.screen.fill(self.BLACK)
+        # Objects unregistered during the frame can be reused from the next one on
+        ObjectPool.recycle_all()
+        if profiler.enabled:
+            profiler.mark('on_frame')
+
+    def render(self):
+        """Draw the current state of the level to the screen."""
+        if settings.dirty_rect_rendering:
+            self.draw_changed_objects()
+        else:
+            # Draw the pre-rendered static objects in place of the background color
+            self.draw_static_layer()
+
+            # Draw the other objects the camera can see
+            for obj in self.get_visible_objects():
+                obj.draw(self.screen)
+
+        if profiler.enabled:
+            profiler.mark('draw')
+
+    def get_visible_objects(self):
+        """Return the non-static objects that intersect the camera view, in registration (drawing) order."""
+        camera = globals.camera
+        visible = globals.collision_grid.query_rect(camera.x, camera.y, camera.x + camera.width, camera.y + camera.height)
+        visible = [obj for obj in visible if obj not in self.static_objects]
+        visible.sort(key=lambda obj: obj.registration_order)
+
+        self.drawn_count = len(visible)
+        self.culled_count = len(globals.game_objects) - len(self.static_objects) - self.drawn_count
+
+        return visible
+
+    def request_full_redraw(self):
+        """Redraw the whole screen on the next frame, e.g. after something else drew over it."""
+        self.full_redraw_requested = True
+
+    def draw_changed_objects(self):
+        """
+        Dirty-rectangle rendering: redraw only the screen areas of objects that moved, spawned, changed or
+        disappeared since the last frame, and leave them in self.dirty_rects for pygame.display.update.
+
+        Falls back to a full redraw (self.dirty_rects = None) whenever the camera scrolls.
+        """
+        visible = self.get_visible_objects()
+        drawn_objects = {obj: obj.draw_state() for obj in visible}
+
+        camera_position = (globals.camera.x, globals.camera.y)
+        if self.full_redraw_requested or camera_position != self.last_camera_position:
+            self.draw_static_layer()
+            for obj in visible:
+                obj.draw(self.screen)
+
+            self.dirty_rects = None
+            self.drawn_objects = drawn_objects
+            self.last_camera_position = camera_position
+            self.full_redraw_requested = False
+            return
+
+        dirty_rects = []
+        for obj, state in drawn_objects.items():
+            previous = self.drawn_objects.pop(obj, None)
+            if previous == state:
+                continue  # Unchanged since the last frame
+
+            # Cover both where the object was and where it is now
+            rects = [rect for rect in (state[0], previous[0] if previous else None) if rect is not None]
+            if rects:
+                dirty_rects.append(rects[0].unionall(rects[1:]))
+
+        # Whatever is left was drawn last frame but is gone now (removed or out of view)
+        dirty_rects.extend(state[0] for state in self.drawn_objects.values() if state[0] is not None)
+
+        screen_rect = self.screen.get_rect()
+        dirty_rects = [rect.clip(screen_rect) for rect in dirty_rects]
+        dirty_rects = [rect for rect in dirty_rects if rect.width and rect.height]
+
+        # Redraw the background and every object that overlaps each dirty area, clipped to it
+        drawable = [obj for obj in visible if drawn_objects[obj][0] is not None]
+        drawable_rects = [drawn_objects[obj][0] for obj in drawable]
+        for rect in dirty_rects:
+            self.screen.set_clip(rect)
+            self.draw_static_layer()
+            for index in rect.collidelistall(drawable_rects):
+                drawable[index].draw(self.screen)
+        self.screen.set_clip(None)
 
-        # Draw all objects
-        for _, obj in globals.game_objects.items():
-            obj.draw(self.screen)
+        self.dirty_rects = dirty_rects
+        self.drawn_objects = drawn_objects
 
     def on_frame(self, events, keys_pressed):
         """
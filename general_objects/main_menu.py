@@ -1,26 +1,46 @@
 from definitions import game_states
 from menu import Menu, Button, Slider, TextBox
 from global_objects import globals
+from settings import settings
+from levels import level_registry
 
 class MainMenu:
     MAIN = 'MAIN'
+    LEVELS = 'LEVELS'
     SETTINGS = 'SETTINGS'
 
-    def __init__(self):
+    def __init__(self, start_level_callback):
+        """
+        Args:
+            start_level_callback: Called with the name of the level to play (see levels.py) once one is picked.
+        """
         self.state = self.MAIN
+        self.start_level_callback = start_level_callback
 
         self.init_main_menu()
+        self.init_levels_menu()
         self.init_settings_menu()
 
     def init_main_menu(self):
         self.main_menu = Menu(exit_callback=self.menu_exit_callback)
 
         play_button = Button("Play", 140, 50, lambda: self.on_play_click())
+        levels_button = Button("Levels", 140, 50, lambda: self.switch_submenu(self.LEVELS))
         settings_button = Button("Settings", 140, 50, lambda: self.switch_submenu(self.SETTINGS))
 
         self.main_menu.add_item(play_button)
+        self.main_menu.add_item(levels_button)
         self.main_menu.add_item(settings_button)
 
+    def init_levels_menu(self):
+        # Only names and labels here, a level's modules are imported once it is picked
+        self.levels_menu = Menu(
+            exit_callback=self.menu_exit_callback,
+            parent_menu_state=self.MAIN)
+
+        for entry in level_registry:
+            self.levels_menu.add_item(Button(entry.label, 200, 50, lambda name=entry.name: self.play(name)))
+
     def init_settings_menu(self):
         self.settings_menu = Menu(
             exit_callback=self.menu_exit_callback,
@@ -52,12 +72,17 @@ class MainMenu:
     def get_menu(self):
         if self.state == self.MAIN:
             return self.main_menu
+        elif self.state == self.LEVELS:
+            return self.levels_menu
         elif self.state == self.SETTINGS:
             return self.settings_menu
 
     def on_play_click(self):
+        self.play(settings.start_level)
+
+    def play(self, level_name):
         self.switch_global_state(game_states.RUNNING)
-        globals.current_level.start()
+        self.start_level_callback(level_name)
 
     def switch_global_state(self, state):
         print(f"Switching to game state {state}")
@@ -66,6 +91,7 @@ class MainMenu:
     def switch_submenu(self, submenu):
         print(f"switching to submenu {submenu}")
         self.state = submenu
+        self.get_menu().request_full_redraw()
 
     def menu_exit_callback(self):
         if self.get_menu().parent_menu_state:
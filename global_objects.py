@@ -7,6 +7,9 @@ class GlobalObjects:
     main_menu = None
     camera = None
     collision_grid = None
+    scheduler = None
+
+    frame_count = 0  # Frames handled by the current level
 
     game_objects = {}
 
@@ -0,0 +1,207 @@
+"""
+Headless runner: steps a level as fast as possible without a display, for load tests and CI.
+
+    python headless.py dummy_objects.particle_level.ParticleLevel --frames 1000 --keys K_LEFT,K_UP --render
+
+Input comes from a script (keys held from given frames on) instead of pygame.key.get_pressed(), and
+rendering is optional: levels draw into an off-screen surface, every frame or every N frames.
+"""
+import argparse
+import importlib
+import json
+import time
+import pygame
+from settings import settings
+from global_objects import globals
+from camera import Camera
+from collision import CollisionGrid
+from scheduler import FrameScheduler
+from profiler import profiler
+import world_snapshot
+from levels import level_registry
+
+class ScriptedKeys:
+    """Stands in for the result of pygame.key.get_pressed(), with a fixed set of held keys."""
+
+    def __init__(self, pressed=()):
+        self.pressed = frozenset(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+class InputScript:
+    """
+    Keys held on each frame: a mapping of frame number -> keys held from that frame on (until the next
+    entry). Frames are counted from 1 like globals.frame_count, and nothing is held before the first entry.
+    """
+
+    def __init__(self, changes=None):
+        self.changes = sorted((int(frame), ScriptedKeys(keys)) for frame, keys in (changes or {}).items())
+        self.next_change = 0
+        self.current = ScriptedKeys()
+
+    @classmethod
+    def from_key_names(cls, changes):
+        """Build a script from key names (e.g. 'K_LEFT') instead of pygame key codes."""
+        return cls({frame: [getattr(pygame, name) for name in names] for frame, names in changes.items()})
+
+    @classmethod
+    def load(cls, path):
+        """Load a JSON object of frame -> list of key names."""
+        with open(path) as file:
+            return cls.from_key_names(json.load(file))
+
+    def keys_for(self, frame):
+        """Keys held on frame; frames must be asked for in increasing order."""
+        while self.next_change < len(self.changes) and self.changes[self.next_change][0] <= frame:
+            self.current = self.changes[self.next_change][1]
+            self.next_change += 1
+
+        return self.current
+
+    def events_for(self, frame):
+        """Events of frame; scripts have none."""
+        return []
+
+class RunResult:
+    def __init__(self, level, frames, simulate_seconds, render_seconds, drawn_objects=0, culled_objects=0, rendered_frames=0):
+        self.level = level
+        self.frames = frames
+        self.simulate_seconds = simulate_seconds
+        self.render_seconds = render_seconds
+        self.drawn_objects = drawn_objects  # Objects drawn, summed over the rendered frames
+        self.culled_objects = culled_objects  # Objects left out of drawing by camera culling, summed likewise
+        self.rendered_frames = rendered_frames
+
+    @property
+    def seconds(self):
+        return self.simulate_seconds + self.render_seconds
+
+    @property
+    def simulation_fps(self):
+        return self.frames / self.simulate_seconds if self.simulate_seconds else float('inf')
+
+    @property
+    def fps(self):
+        return self.frames / self.seconds if self.seconds else float('inf')
+
+    def __str__(self):
+        text = (f"{type(self.level).__name__}: {self.frames} frames in {self.seconds:.3f}s, "
+                f"{self.fps:.1f} fps ({self.simulation_fps:.1f} fps simulation only, "
+                f"{self.render_seconds:.3f}s rendering)")
+        if self.rendered_frames:
+            text += (f", {self.drawn_objects / self.rendered_frames:.1f} objects drawn and "
+                     f"{self.culled_objects / self.rendered_frames:.1f} culled per rendered frame")
+        return text
+
+def load_level_class(path):
+    """Import a level class from its dotted path, e.g. 'dummy_objects.particle_level.ParticleLevel', or its name in levels.py."""
+    if path in level_registry:
+        return level_registry.load(path)
+
+    module_name, class_name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+def reset_world():
+    """Give the next level a fresh camera, collision grid, scheduler and object registry."""
+    globals.game_objects.clear()
+    globals.camera = Camera()
+    globals.collision_grid = CollisionGrid()
+    globals.scheduler = FrameScheduler()
+    globals.frame_count = 0
+
+def start_level(level_class, screen=None):
+    """Create and start a level on a fresh world, drawing into screen (an off-screen surface by default)."""
+    reset_world()
+
+    if screen is None:
+        screen = pygame.Surface((settings.screen_width, settings.screen_height))
+
+    level = level_class(screen)
+    globals.current_level = level
+    level.start()
+    return level
+
+def run(level_class, frames, inputs=None, render=False, render_every=1, level=None):
+    """
+    Step a level for the given number of frames at unlimited speed.
+
+    Args:
+        level_class: Level subclass to start, unless an already started level is given.
+        frames (int): Frames to simulate.
+        inputs (InputScript): Keys held and events on each frame, nothing by default.
+        render (bool): Whether to draw the level, into its off-screen screen surface.
+        render_every (int): Draw only every N-th frame when rendering.
+        level (Level): Level to keep running instead of starting a new one.
+
+    Returns:
+        RunResult with the level, the time spent simulating and rendering and the objects drawn and culled.
+    """
+    if level is None:
+        level = start_level(level_class)
+    if inputs is None:
+        inputs = InputScript()
+
+    simulate_seconds = render_seconds = 0.0
+    drawn_objects = culled_objects = rendered_frames = 0
+    for _ in range(frames):
+        if profiler.enabled:
+            profiler.begin_frame()
+
+        frame = globals.frame_count + 1
+        start = time.perf_counter()
+        level.simulate(inputs.events_for(frame), inputs.keys_for(frame))
+        simulate_seconds += time.perf_counter() - start
+
+        if render and globals.frame_count % render_every == 0:
+            start = time.perf_counter()
+            level.render()
+            render_seconds += time.perf_counter() - start
+
+            drawn_objects += level.drawn_count
+            culled_objects += level.culled_count
+            rendered_frames += 1
+
+        if profiler.enabled:
+            profiler.end_frame()
+
+    return RunResult(level, frames, simulate_seconds, render_seconds, drawn_objects, culled_objects, rendered_frames)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a level without a display and report its speed.")
+    parser.add_argument('level', nargs='?', help="dotted path of the Level subclass, e.g. dummy_objects.particle_level.ParticleLevel, or a level name from levels.py")
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--keys', default='', help="comma separated key names held for the whole run, e.g. K_LEFT,K_UP")
+    parser.add_argument('--script', help="JSON file of frame -> key names held from that frame on")
+    parser.add_argument('--render', action='store_true', help="also draw every frame to an off-screen surface")
+    parser.add_argument('--render-every', type=int, default=1, help="with --render, draw only every N-th frame")
+    parser.add_argument('--profile', help="write per-frame phase timings to this .csv or .jsonl file")
+    parser.add_argument('--load-snapshot', help="continue the world saved in this snapshot instead of starting the level")
+    parser.add_argument('--save-snapshot', help="save the world to this snapshot after the run")
+    args = parser.parse_args()
+
+    if args.load_snapshot:
+        reset_world()
+        level = world_snapshot.load(args.load_snapshot)
+    elif args.level:
+        level = start_level(load_level_class(args.level))
+    else:
+        parser.error("a level or --load-snapshot is required")
+
+    if args.script:
+        inputs = InputScript.load(args.script)
+    else:
+        inputs = InputScript.from_key_names({1: [name for name in args.keys.split(',') if name]})
+
+    if args.profile:
+        profiler.enable()
+
+    print(run(None, args.frames, inputs, args.render, args.render_every, level=level))
+
+    if args.profile:
+        profiler.export(args.profile)
+    if args.save_snapshot:
+        world_snapshot.save(args.save_snapshot)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Registry of the playable levels, by name.
+
+Levels are registered with the dotted path of their class and only imported once one is loaded, so
+starting the game does not pay for the modules of every level (the custom event level alone pulls in
+pydantic and the abilities). Register a new level with one line at the bottom of this file, it then
+shows up in the main menu's level list.
+"""
+import importlib
+
+class LevelEntry:
+    def __init__(self, name, label, path):
+        self.name = name
+        self.label = label  # Shown in the menu
+        self.path = path  # Dotted path of the Level subclass
+
+class LevelRegistry:
+    def __init__(self):
+        self.entries = {}
+
+        # Name -> imported level class
+        self.classes = {}
+
+    def register(self, name, label, path):
+        self.entries[name] = LevelEntry(name, label, path)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __iter__(self):
+        return iter(self.entries.values())
+
+    def load(self, name):
+        """Return the class of a registered level, importing its module the first time."""
+        level_class = self.classes.get(name)
+        if level_class is None:
+            module_name, class_name = self.entries[name].path.rsplit('.', 1)
+            level_class = getattr(importlib.import_module(module_name), class_name)
+            self.classes[name] = level_class
+        return level_class
+
+level_registry = LevelRegistry()
+level_registry.register('custom_events', 'Custom events', 'custom_event_level_test.level.CusomEventLevel')
+level_registry.register('particles', 'Particles', 'dummy_objects.particle_level.ParticleLevel')
+level_registry.register('dummy', 'Dummy', 'dummy_objects.dummy_level.DummyLevel')
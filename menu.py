@@ -1,4 +1,5 @@
 import pygame
+from collections import OrderedDict
 
 # Colors
 WHITE = (255, 255, 255)
@@ -8,28 +9,90 @@ GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
 GRAY = (200, 200, 200)
 
+class FontRegistry:
+    """
+    Fonts shared by the whole menu, loaded once per (name, size).
+
+    pygame.font.SysFont looks the font up among the system fonts on every call, so menu items get their
+    fonts from here instead of loading their own.
+    """
+
+    def __init__(self):
+        self.fonts = {}
+
+    def get(self, name, size):
+        font = self.fonts.get((name, size))
+        if font is None:
+            font = pygame.font.SysFont(name, size)
+            self.fonts[(name, size)] = font
+        return font
+
+class TextCache:
+    """
+    Rendered text surfaces by (text, font, color), the least recently used dropped beyond CAPACITY.
+
+    Labels are the same every frame and are rendered once, while text that keeps changing (a text box
+    being typed in) only keeps its latest CAPACITY renderings around.
+    """
+
+    CAPACITY = 256
+
+    def __init__(self):
+        self.surfaces = OrderedDict()
+
+    def render(self, text, font, color):
+        key = (text, font, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.CAPACITY:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+fonts = FontRegistry()
+text_cache = TextCache()
+
 # Helper function to render text
 def render_text(text, font, color=WHITE):
-    return font.render(text, True, color)
+    return text_cache.render(text, font, color)
 
 # Base class for menu elements
 class MenuItem:
+    LABEL_X_OFFSET = 150
+
     def __init__(self, label, w, h, should_draw_label=True):
         # Fonts
-        self.font = pygame.font.SysFont('Arial', 24)
+        self.font = fonts.get('Arial', 24)
         self.label_font = self.font
-        self.small_font = pygame.font.SysFont('Arial', 16)
+        self.small_font = fonts.get('Arial', 16)
 
         self.label = label
         self.should_draw_label = should_draw_label
         self.rect = pygame.Rect(0, 0, w, h)  # Position will be set later
 
+        # Whether the item changed since the menu last drew it
+        self.dirty = True
+
     def set_position(self, x, y):
         self.rect.topleft = (x, y)
+        self.dirty = True
 
-    def draw_label(self, screen, font, label_x_offset=150):
+    def draw_label(self, screen, font, label_x_offset=LABEL_X_OFFSET):
         label_surface = render_text(self.label, font)
-        screen.blit(label_surface, (self.rect.x - label_x_offset, self.rect.y))
+        return screen.blit(label_surface, (self.rect.x - label_x_offset, self.rect.y))
+
+    def bounds(self):
+        """Screen area the item and its label cover."""
+        if not self.should_draw_label:
+            return self.rect
+        label_rect = pygame.Rect((self.rect.x - self.LABEL_X_OFFSET, self.rect.y), self.label_font.size(self.label))
+        return self.rect.union(label_rect)
 
     def draw(self, screen):
         raise NotImplementedError
@@ -70,6 +133,7 @@ class Slider(MenuItem):
         if event.type == pygame.MOUSEBUTTONDOWN and self.rect.collidepoint(event.pos):
             relative_x = event.pos[0] - self.rect.x
             self.current_value = (relative_x / self.rect.width) * (self.max_value - self.min_value) + self.min_value
+            self.dirty = True
 
 # TextBox class
 class TextBox(MenuItem):
@@ -85,22 +149,25 @@ class TextBox(MenuItem):
         pygame.draw.rect(screen, WHITE, self.rect)
         pygame.draw.rect(screen, box_color, self.rect, 2)
         
-        # Handle text overflow
-        text_surface = render_text(self.text, self.font, BLACK)
-        text_width = text_surface.get_width()
-        if text_width > self.rect.width - 10:  # Clip text if it overflows
-            clipped_text = self.text[-int((self.rect.width - 10) / self.font.size('A')[0]):]
-            text_surface = render_text(clipped_text, self.font, BLACK)
+        # Handle text overflow, measured without rendering the text that would not be shown
+        text = self.text
+        if self.font.size(text)[0] > self.rect.width - 10:  # Clip text if it overflows
+            text = self.text[-int((self.rect.width - 10) / self.font.size('A')[0]):]
+        text_surface = render_text(text, self.font, BLACK)
         screen.blit(text_surface, (self.rect.x + 5, self.rect.y + 5))
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN:
-            self.active = self.rect.collidepoint(event.pos)  # Toggle activation
+            active = self.rect.collidepoint(event.pos)  # Toggle activation
+            if active != self.active:
+                self.active = active
+                self.dirty = True
         if self.active and event.type == pygame.KEYDOWN:
             if event.key == pygame.K_BACKSPACE:
                 self.text = self.text[:-1]
             elif event.unicode.isprintable():
                 self.text += event.unicode
+            self.dirty = True
 
 # Menu class for managing the menu system
 class Menu:
@@ -112,17 +179,42 @@ class Menu:
         self.y_start = y_start
         self.y_spacing = y_spacing
 
+        # Whether the whole screen has to be drawn, not only the items that changed
+        self.full_redraw = True
+
     def add_item(self, item):
         item.set_position(self.x_offset, self.y_start + len(self.items) * self.y_spacing)
         self.items.append(item)
+        self.full_redraw = True
 
-    def draw(self, screen):
-        screen.fill(BLACK)
+    def request_full_redraw(self):
+        """Draw the whole menu on the next frame, e.g. after something else was drawn over it."""
+        self.full_redraw = True
 
-        for item in self.items:
+    def draw(self, screen):
+        """
+        Draw the menu, only the items that changed since the last call unless a full redraw was requested.
+
+        Returns:
+            The screen areas drawn.
+        """
+        if self.full_redraw:
+            screen.fill(BLACK)
+            self.full_redraw = False
+            items = self.items
+            dirty_rects = [screen.get_rect()]
+        else:
+            # Items do not overlap, so each one is cleared and redrawn on its own
+            items = [item for item in self.items if item.dirty]
+            dirty_rects = [screen.fill(BLACK, item.bounds()) for item in items]
+
+        for item in items:
             if item.should_draw_label:
                 item.draw_label(screen, item.label_font)  # Draw the label first
             item.draw(screen)  # Draw the menu item itself
+            item.dirty = False
+
+        return dirty_rects
 
     def handle_event(self, event):
         for item in self.items:
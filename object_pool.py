@@ -0,0 +1,48 @@
+from settings import settings
+
+class ObjectPool:
+    """
+    Free list of unregistered game objects of one class, reused instead of allocating new ones.
+
+    Objects are released when they unregister but only become reusable at the end of the frame
+    (recycle), since other objects may still hold on to them, or call them, until then. Reused objects
+    are reset through their reset method with the same arguments as their constructor, and get a new id.
+    """
+
+    # Every pool, recycled together by the level at the end of each frame
+    pools = []
+
+    def __init__(self, cls, capacity=None):
+        self.cls = cls
+        self.capacity = capacity if capacity is not None else settings.object_pool_capacity
+        self.free = []  # Ready to reuse
+        self.released = []  # Unregistered this frame
+
+        ObjectPool.pools.append(self)
+
+    def acquire(self, *args, **kwargs):
+        """Return a reset free object, or a new one if there are none."""
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args, **kwargs)
+            return obj
+
+        return self.cls(*args, **kwargs)
+
+    def release(self, obj):
+        self.released.append(obj)
+
+    def recycle(self):
+        """Make the objects released during this frame reusable, up to the pool's capacity."""
+        if self.released:
+            self.free.extend(self.released[:max(self.capacity - len(self.free), 0)])
+            self.released.clear()
+
+    def clear(self):
+        self.free.clear()
+        self.released.clear()
+
+    @classmethod
+    def recycle_all(cls):
+        for pool in cls.pools:
+            pool.recycle()
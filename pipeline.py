@@ -0,0 +1,408 @@
+"""
+Pipelined mode: the level is simulated in a worker process while the main process renders.
+
+    python pipeline.py custom_event_level_test.level.CusomEventLevel --frames 600 --keys K_RIGHT
+
+Every frame the worker simulates frame N+1 while the main process draws frame N. The worker reduces a
+simulated frame to a render snapshot: the camera position and a list of (model id, screen x, screen y)
+rows, one per object (or batched instance, or particle) to blit. The rows are written to one of two
+shared memory slots, and models (keyed like sprite_cache keys) are sent once, the first time they are seen.
+Keys pressed and input events in the main process are forwarded to the worker, so input shows up one
+frame later than in the normal loop.
+
+The worker is spawned, not forked: forking a process that has initialized SDL is unsafe on macOS and
+not possible on Windows. It starts in a fresh interpreter with the main process' settings (and the
+random seed, if one is given) and never opens the display, only the main process draws.
+"""
+import argparse
+import multiprocessing
+import random
+import time
+import traceback
+from multiprocessing import shared_memory
+import numpy as np
+import pygame
+import headless
+from headless import InputScript, RunResult
+from settings import settings
+from global_objects import globals
+from square import Square, model_version
+from sprite_cache import sprite_cache, squares_from_key
+from profiler import profiler
+
+class RenderSnapshot:
+    """
+    Collects what a frame draws as (model id, screen x, screen y) rows, in drawing order.
+
+    Objects add themselves through draw_snapshot(snapshot). Rows outside the screen are culled, and models
+    with nothing visible are skipped.
+    """
+
+    def __init__(self):
+        self.model_ids = {}  # sprite_cache model key -> model id
+        self.model_bounds = []  # Model id -> visible (left, top, right, bottom) relative to the object
+        self.new_models = {}  # Models not yet sent to the renderer, model id -> key
+        self.squares_models = {}  # id(squares) -> (squares, model_version, model id) of models seen recently
+        self.pixel_models = {}  # 0xRRGGBB -> model id of a 1x1 square of that color
+
+        self.camera_x = 0
+        self.camera_y = 0
+        self.cull = True
+        self.rows = []  # Rows added one at a time since the last chunk
+        self.chunks = []
+
+    def begin(self, camera_x, camera_y, cull=True):
+        self.camera_x = camera_x
+        self.camera_y = camera_y
+        self.cull = cull
+        self.rows = []
+        self.chunks = []
+
+    def finish(self):
+        """Return the frame's rows as an (n, 3) int32 array."""
+        self.flush_rows()
+        if not self.chunks:
+            return np.zeros((0, 3), dtype=np.int32)
+
+        return np.concatenate(self.chunks).astype(np.int32, copy=False)
+
+    def take_new_models(self):
+        new_models, self.new_models = self.new_models, {}
+        return new_models
+
+    def flush_rows(self):
+        if self.rows:
+            self.chunks.append(np.array(self.rows, dtype=np.int32))
+            self.rows = []
+
+    def model_id(self, squares):
+        """Model id of a list of squares, or None if nothing of it is visible."""
+        version = model_version(squares)
+        cached = self.squares_models.get(id(squares))
+        if cached is not None and cached[0] is squares and cached[1] == version:
+            return cached[2]
+
+        key = sprite_cache.model_key(squares)
+        model_id = self.model_ids.get(key)
+        if model_id is None:
+            model_id = len(self.model_bounds)
+            self.model_ids[key] = model_id
+            self.model_bounds.append(self.bounds(key))
+            self.new_models[model_id] = key
+
+        if self.model_bounds[model_id] is None:
+            model_id = None
+
+        self.squares_models[id(squares)] = (squares, version, model_id)
+        return model_id
+
+    def bounds(self, key):
+        """Bounds of the visible squares of a model, which is where its sprite sits (see SpriteCache.render)."""
+        visible = [square for square in key if not square[5] and square[2] > 0 and square[3] > 0]
+        if not visible:
+            return None
+
+        return (min(square[0] for square in visible), min(square[1] for square in visible),
+                max(square[0] + square[2] for square in visible), max(square[1] + square[3] for square in visible))
+
+    def add(self, squares, x, y):
+        """Add one object with the given squares at (x, y), in game-world pixel units."""
+        model_id = self.model_id(squares)
+        if model_id is None:
+            return
+
+        left, top, right, bottom = self.model_bounds[model_id]
+        view_x = x + left - self.camera_x
+        view_y = y + top - self.camera_y
+        if self.cull and (view_x >= globals.camera.width or view_x + right - left <= 0 or
+                          view_y >= globals.camera.height or view_y + bottom - top <= 0):
+            return
+
+        self.rows.append((model_id, view_x * settings.pixel_size, view_y * settings.pixel_size))
+
+    def add_many(self, squares, xs, ys):
+        """Add objects sharing one model at the positions in the arrays xs and ys."""
+        model_id = self.model_id(squares)
+        if model_id is None or not len(xs):
+            return
+
+        left, top, right, bottom = self.model_bounds[model_id]
+        self.add_rows(np.full(len(xs), model_id), xs + left - self.camera_x, ys + top - self.camera_y,
+                      right - left, bottom - top)
+
+    def add_pixels(self, xs, ys, colors):
+        """Add 1x1 squares at the positions in xs and ys, each with its own color (an (n, 3) array)."""
+        if not len(xs):
+            return
+
+        colors = colors.astype(np.int32)
+        packed_colors, color_indices = np.unique(colors[:, 0] << 16 | colors[:, 1] << 8 | colors[:, 2], return_inverse=True)
+        color_models = np.array([self.pixel_model(color) for color in packed_colors.tolist()])
+        self.add_rows(color_models[color_indices.reshape(-1)], xs - self.camera_x, ys - self.camera_y, 1, 1)
+
+    def pixel_model(self, packed_color):
+        model_id = self.pixel_models.get(packed_color)
+        if model_id is None:
+            color = (packed_color >> 16, packed_color >> 8 & 0xFF, packed_color & 0xFF)
+            model_id = self.pixel_models[packed_color] = self.model_id([Square(0, 0, 1, 1, color)])
+        return model_id
+
+    def add_rows(self, model_ids, view_x, view_y, width, height):
+        if self.cull:
+            visible = (view_x < globals.camera.width) & (view_x + width > 0) & \
+                (view_y < globals.camera.height) & (view_y + height > 0)
+            model_ids, view_x, view_y = model_ids[visible], view_x[visible], view_y[visible]
+
+        self.flush_rows()
+        self.chunks.append(np.stack([model_ids, view_x * settings.pixel_size, view_y * settings.pixel_size], axis=1))
+
+def snapshot_static(level, snapshot):
+    """Rows of the level's static objects in map coordinates, for the renderer to bake its static layer."""
+    snapshot.begin(0, 0, cull=False)
+    for obj in globals.game_objects.values():
+        if obj in level.static_objects:
+            obj.draw_snapshot(snapshot)
+    return snapshot.finish()
+
+def snapshot_frame(level, snapshot):
+    """Rows of the objects the camera sees, in drawing order."""
+    snapshot.begin(globals.camera.x, globals.camera.y)
+    for obj in level.get_visible_objects():
+        obj.draw_snapshot(snapshot)
+    return snapshot.finish()
+
+# Input events forwarded to the worker, other events concern the main process' window
+FORWARDED_EVENT_TYPES = (pygame.KEYDOWN, pygame.KEYUP, pygame.TEXTINPUT, pygame.MOUSEMOTION,
+                         pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEWHEEL)
+
+def pack_events(events):
+    """The forwarded events as picklable (type, attributes) pairs."""
+    return [(event.type, {name: value for name, value in event.dict.items() if name != 'window'})
+            for event in events if event.type in FORWARDED_EVENT_TYPES]
+
+def unpack_events(packed_events):
+    return [pygame.event.Event(event_type, attributes) for event_type, attributes in packed_events]
+
+def run_worker(level_class, connection, memory_name, capacity, settings_values, seed):
+    """
+    Worker process: start the level, then simulate one frame per input message received and answer with
+    the frame's snapshot, until it receives None.
+    """
+    memory = shared_memory.SharedMemory(name=memory_name)
+    slots = np.ndarray((2, capacity, 3), dtype=np.int32, buffer=memory.buf)
+    try:
+        # A spawned process only has the defaults of settings
+        for name, value in settings_values.items():
+            setattr(settings, name, value)
+        if seed is not None:
+            random.seed(seed)
+
+        level = headless.start_level(level_class)
+        snapshot = RenderSnapshot()
+
+        static_rows = snapshot_static(level, snapshot)
+        connection.send(('static', snapshot.take_new_models(), static_rows))
+
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+
+            packed_events, keys_pressed = message
+            level.simulate(unpack_events(packed_events), keys_pressed)
+            rows = snapshot_frame(level, snapshot)
+
+            # Rows that do not fit the slot go along with the message
+            slot = globals.frame_count % 2
+            count = min(len(rows), capacity)
+            slots[slot, :count] = rows[:count]
+            connection.send(('frame', globals.frame_count, slot, count, globals.camera.x, globals.camera.y,
+                             snapshot.take_new_models(), rows[count:] if count < len(rows) else None))
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+    finally:
+        del slots
+        memory.close()
+        connection.close()
+
+class SimulationPipeline:
+    """
+    Main process side of the pipelined mode: runs a level in a worker process and draws the snapshots it
+    sends back.
+
+    Call step(keys_pressed, screen, events) once per frame, and stop() when done.
+    """
+
+    BLACK = (0, 0, 0)
+
+    def __init__(self, level_class, capacity=None, seed=None):
+        self.level_class = level_class
+        self.capacity = capacity if capacity else settings.pipeline_snapshot_capacity
+        self.seed = seed  # Seeds random in the worker before the level is created
+
+        self.process = None
+        self.connection = None
+        self.memory = None
+        self.slots = None
+        self.in_flight = False  # Whether the worker is simulating a frame we have not received yet
+
+        self.sprites = []  # Model id -> Sprite (None for models with nothing visible)
+        self.static_layer = None
+        self.frame_count = 0  # Frame last drawn
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        self.memory = shared_memory.SharedMemory(create=True, size=2 * self.capacity * 3 * np.dtype(np.int32).itemsize)
+        self.slots = np.ndarray((2, self.capacity, 3), dtype=np.int32, buffer=self.memory.buf)
+
+        self.connection, worker_connection = context.Pipe()
+        self.process = context.Process(target=run_worker, daemon=True,
+                                       args=(self.level_class, worker_connection, self.memory.name, self.capacity,
+                                             dict(vars(settings)), self.seed))
+        self.process.start()
+        worker_connection.close()
+
+        _, new_models, static_rows = self.receive('static')
+        self.add_models(new_models)
+        self.bake_static_layer(static_rows)
+
+    def stop(self):
+        """Stop the worker and free the shared memory, also after start() failed part way."""
+        try:
+            if self.process is not None and self.process.is_alive():
+                if self.in_flight:
+                    self.receive('frame')
+                self.connection.send(None)
+                self.process.join()
+        finally:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+            if self.memory is not None:
+                self.slots = None
+                self.memory.close()
+                self.memory.unlink()
+                self.memory = None
+            self.process = None
+            self.in_flight = False
+
+    def receive(self, kind):
+        try:
+            message = self.connection.recv()
+        except EOFError:
+            raise RuntimeError("The simulation worker exited unexpectedly") from None
+
+        if message[0] == 'error':
+            self.in_flight = False
+            self.process.join()
+            raise RuntimeError(f"The simulation worker failed:\n{message[1]}")
+
+        assert message[0] == kind, f"Expected a {kind} message from the simulation worker, got {message[0]}"
+        return message
+
+    def submit(self, keys_pressed, events=()):
+        """Have the worker simulate the next frame with keys_pressed and events."""
+        self.connection.send((pack_events(events), keys_pressed))
+        self.in_flight = True
+
+    def step(self, keys_pressed, screen, events=()):
+        """
+        Draw the frame the worker finished to screen, after handing it keys_pressed and events for the next
+        frame. If no frame was submitted before, the first frame is simulated with them, and the next one
+        with keys_pressed only, so every event reaches the worker once.
+        """
+        primed = not self.in_flight
+        if primed:
+            self.submit(keys_pressed, events)
+
+        _, frame_count, slot, count, camera_x, camera_y, new_models, overflow = self.receive('frame')
+
+        # The worker simulates the next frame into the other slot while this one is drawn
+        self.submit(keys_pressed, () if primed else events)
+        if profiler.enabled:
+            profiler.mark('sync')
+
+        self.add_models(new_models)
+        rows = self.slots[slot, :count]
+        if overflow is not None:
+            rows = np.concatenate([rows, overflow])
+
+        self.draw_static_layer(screen, camera_x, camera_y)
+        self.draw_rows(screen, rows)
+        self.frame_count = frame_count
+
+        if profiler.enabled:
+            profiler.mark('draw')
+
+    def add_models(self, new_models):
+        for model_id, key in new_models.items():
+            squares = squares_from_key(key)
+            while len(self.sprites) <= model_id:
+                self.sprites.append(None)
+            self.sprites[model_id] = sprite_cache.get(squares, key)
+
+    def draw_rows(self, surface, rows):
+        sprites = self.sprites
+        surface.blits([(sprites[model_id].surface, (x, y)) for model_id, x, y in rows.tolist()], doreturn=False)
+
+    def bake_static_layer(self, rows):
+        if not len(rows):
+            self.static_layer = None
+            return
+
+        self.static_layer = pygame.Surface((settings.map_width * settings.pixel_size, settings.map_height * settings.pixel_size))
+        self.static_layer.fill(self.BLACK)
+        self.draw_rows(self.static_layer, rows)
+
+    def draw_static_layer(self, screen, camera_x, camera_y):
+        """Fill the screen with the part of the static layer the camera sees (see Level.draw_static_layer)."""
+        if self.static_layer is None:
+            screen.fill(self.BLACK)
+            return
+
+        camera = globals.camera
+        visible_area = pygame.Rect(camera_x * settings.pixel_size, camera_y * settings.pixel_size,
+                                   camera.width * settings.pixel_size, camera.height * settings.pixel_size)
+
+        if not self.static_layer.get_rect().contains(visible_area):
+            screen.fill(self.BLACK)  # The camera sees past the map
+
+        screen.blit(self.static_layer, (0, 0), visible_area)
+
+def run(level_class, frames, inputs=None, screen=None, seed=None):
+    """Run a level pipelined for the given number of frames at unlimited speed, drawing off-screen."""
+    if inputs is None:
+        inputs = InputScript()
+    if screen is None:
+        screen = pygame.Surface((settings.screen_width, settings.screen_height))
+    if globals.camera is None:
+        headless.reset_world()
+
+    pipeline = SimulationPipeline(level_class, seed=seed)
+    try:
+        pipeline.start()
+        start = time.perf_counter()
+        pipeline.submit(inputs.keys_for(1), inputs.events_for(1))
+        for frame in range(1, frames + 1):
+            # The input handed over while frame N is drawn is simulated in frame N + 1
+            pipeline.step(inputs.keys_for(frame + 1), screen, inputs.events_for(frame + 1))
+        seconds = time.perf_counter() - start
+    finally:
+        pipeline.stop()
+
+    return RunResult(level_class, frames, seconds, 0.0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a level pipelined without a display and report its speed.")
+    parser.add_argument('level', help="dotted path of the Level subclass, e.g. dummy_objects.particle_level.ParticleLevel, or a level name from levels.py")
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--keys', default='', help="comma separated key names held for the whole run, e.g. K_LEFT,K_UP")
+    args = parser.parse_args()
+
+    inputs = InputScript.from_key_names({1: [name for name in args.keys.split(',') if name]})
+    level_class = headless.load_level_class(args.level)
+    result = run(level_class, args.frames, inputs)
+    print(f"{level_class.__name__}: {result.frames} frames in {result.seconds:.3f}s pipelined, {result.fps:.1f} fps")
+
+if __name__ == "__main__":
+    main()
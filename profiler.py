@@ -0,0 +1,137 @@
+import csv
+import json
+import time
+from collections import deque
+from settings import settings
+from global_objects import globals
+
+class FrameProfiler:
+    """
+    Per-frame timings of the phases of the frame loop (events, handle_keys, on_frame, draw, flip, ...).
+
+    Call sites guard themselves with `if profiler.enabled:` and then call mark(phase), which charges the
+    time since the previous mark to the phase, so a disabled profiler costs one attribute check per
+    phase. Work nested inside a phase (e.g. collision checks during on_frame) is timed by its call site
+    and charged with add(), and is left out of the enclosing phase, so the phases of a frame add up to
+    its total.
+
+    Finished frames are kept as (frame number, {phase: seconds}) in a bounded buffer.
+    """
+
+    def __init__(self, enabled=None, capacity=None):
+        self.enabled = enabled if enabled is not None else settings.profiling
+        self.frames = deque(maxlen=capacity if capacity else settings.profiler_capacity)
+        self.current = None  # Timings of the frame in progress
+        self.last_mark = 0.0
+        self.nested = 0.0  # Seconds charged with add() since the last mark
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+        self.current = None
+
+    def begin_frame(self):
+        """Start timing a new frame, finishing the previous one if it was not finished explicitly."""
+        if self.current is not None:
+            self.end_frame()
+
+        self.current = {}
+        self.nested = 0.0
+        self.last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        """Charge the time since the last mark (or the start of the frame) to phase."""
+        now = time.perf_counter()
+        if self.current is not None:
+            self.current[phase] = self.current.get(phase, 0.0) + now - self.last_mark - self.nested
+        self.nested = 0.0
+        self.last_mark = now
+
+    def add(self, phase, seconds):
+        """Charge work timed by the caller, nested inside the phase currently being timed, to phase."""
+        if self.current is not None:
+            self.current[phase] = self.current.get(phase, 0.0) + seconds
+            self.nested += seconds
+
+    def end_frame(self):
+        if self.current is None:
+            return
+
+        self.frames.append((globals.frame_count, self.current))
+        self.current = None
+
+    def clear(self):
+        self.frames.clear()
+        self.current = None
+
+    def recent_frames(self, count=None):
+        """Timings of the last count recorded frames (all of them by default)."""
+        if count is None or count >= len(self.frames):
+            return [timings for _, timings in self.frames]
+
+        return [self.frames[index][1] for index in range(len(self.frames) - count, len(self.frames))]
+
+    def phases(self, frames=None):
+        """Every phase seen in the frames, in the order they were first seen."""
+        phases = {}
+        for timings in frames if frames is not None else self.recent_frames():
+            phases.update(dict.fromkeys(timings))
+        return list(phases)
+
+    def summary(self, percents=(50, 90, 99), count=None):
+        """
+        Args:
+            count (int): Summarize only the last count frames (a rolling window), all frames by default.
+
+        Returns:
+            {phase: {'mean': ms, 'p50': ms, ...}} over the recorded frames, including a 'total' phase.
+        """
+        frames = self.recent_frames(count)
+        summary = {}
+        for phase in self.phases(frames) + ['total']:
+            if phase == 'total':
+                times = sorted(sum(timings.values()) for timings in frames)
+            else:
+                times = sorted(timings.get(phase, 0.0) for timings in frames)
+            if not times:
+                continue
+
+            stats = {'mean': sum(times) / len(times) * 1000}
+            for percent in percents:
+                stats[f'p{percent}'] = percentile(times, percent) * 1000
+            summary[phase] = stats
+
+        return summary
+
+    def export(self, file_or_path):
+        """
+        Write the recorded frames, one per row/line with ms per phase: CSV for paths ending in .csv,
+        JSON lines otherwise.
+        """
+        if isinstance(file_or_path, str):
+            with open(file_or_path, 'w', newline='') as file:
+                self.write(file, csv_format=file_or_path.endswith('.csv'))
+        else:
+            self.write(file_or_path)
+
+    def write(self, file, csv_format=False):
+        if csv_format:
+            phases = self.phases()
+            writer = csv.writer(file)
+            writer.writerow(['frame'] + phases + ['total'])
+            for frame, timings in self.frames:
+                writer.writerow([frame] + [f"{timings.get(phase, 0.0) * 1000:.4f}" for phase in phases] +
+                                [f"{sum(timings.values()) * 1000:.4f}"])
+            return
+
+        for frame, timings in self.frames:
+            record = {'frame': frame}
+            record.update((phase, round(seconds * 1000, 4)) for phase, seconds in timings.items())
+            record['total'] = round(sum(timings.values()) * 1000, 4)
+            file.write(json.dumps(record) + '\n')
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(int(-(-percent * len(sorted_values) // 100)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+profiler = FrameProfiler()
@@ -0,0 +1,117 @@
+import pygame
+from global_objects import globals
+from profiler import profiler
+
+class ProfilerOverlay:
+    """
+    On-screen table of rolling p50/p99 frame phase timings, toggled in game.
+
+    Showing the overlay turns the profiler on (and hiding it restores the previous setting). The table
+    is re-rendered every REFRESH_FRAMES frames, not every frame, so it barely shows up in its own numbers.
+
+    The objects the level drew and culled in the last frame are shown below the phases, and while the
+    collision grid counts its work, its counters too, per frame since the last refresh.
+    """
+
+    WINDOW = 120  # Frames the percentiles are computed over
+    REFRESH_FRAMES = 15
+    POSITION = (10, 40)  # Below the FPS warning
+    TEXT_COLOR = (230, 230, 230)
+    BACKGROUND_COLOR = (0, 0, 0)
+    COLUMN_GAP = 12
+
+    def __init__(self):
+        self.visible = False
+        self.font = None
+        self.surface = None
+        self.frames_until_refresh = 0
+        self.profiler_was_enabled = False
+
+        # Whether the last draw changed the table's size, so whatever drew under a larger table has to draw
+        # the whole screen again (with dirty-rectangle rendering only changed areas are redrawn)
+        self.resized = False
+
+        # Collision counters at the last refresh, to show them per frame
+        self.last_counters = None
+        self.last_counters_frame = 0
+
+    def toggle(self):
+        self.visible = not self.visible
+        if self.visible:
+            self.profiler_was_enabled = profiler.enabled
+            profiler.enable()
+            self.frames_until_refresh = 0
+        else:
+            profiler.enable(self.profiler_was_enabled)
+
+    def render_table(self):
+        if self.font is None:
+            self.font = pygame.font.SysFont('monospace', 14)
+
+        summary = profiler.summary(percents=(50, 99), count=self.WINDOW)
+        rows = [('phase', 'p50 ms', 'p99 ms')]
+        rows += [(phase, f"{stats['p50']:.2f}", f"{stats['p99']:.2f}") for phase, stats in summary.items()]
+        rows += self.culling_rows()
+        rows += self.counter_rows()
+
+        # Lay the cells out in columns, the font may not be monospaced
+        cells = [[self.font.render(text, True, self.TEXT_COLOR) for text in row] for row in rows]
+        widths = [max(row[column].get_width() for row in cells) + self.COLUMN_GAP for column in range(len(rows[0]))]
+        line_height = self.font.get_linesize()
+
+        surface = pygame.Surface((sum(widths), line_height * len(rows)))
+        surface.fill(self.BACKGROUND_COLOR)
+        for index, row in enumerate(cells):
+            x = 0
+            for column, cell in enumerate(row):
+                # Numbers are right-aligned, phase names left-aligned
+                offset = 0 if column == 0 else widths[column] - self.COLUMN_GAP - cell.get_width()
+                surface.blit(cell, (x + offset + (0 if column == 0 else self.COLUMN_GAP), index * line_height))
+                x += widths[column]
+
+        return surface
+
+    def culling_rows(self):
+        level = globals.current_level
+        if level is None:
+            return []
+
+        return [('', '', ''), ('objects', 'last frame', ''),
+                ('drawn', str(level.drawn_count), ''), ('culled', str(level.culled_count), '')]
+
+    def counter_rows(self):
+        counters = globals.collision_grid.counters if globals.collision_grid is not None else None
+        if counters is None:
+            self.last_counters = None
+            return []
+
+        current = counters.as_dict()
+        frames = globals.frame_count - self.last_counters_frame
+        rows = [('', '', ''), ('grid', 'per frame', '')]
+        if self.last_counters is not None and frames > 0:
+            for field, value in current.items():
+                if field == 'max_cell_objects':
+                    rows.append((field, str(value), ''))
+                else:
+                    rows.append((field, f"{(value - self.last_counters.get(field, 0)) / frames:.1f}", ''))
+
+        self.last_counters = current
+        self.last_counters_frame = globals.frame_count
+        return rows
+
+    def draw(self, screen):
+        """Draw the table if visible, returns the screen area drawn (None if hidden)."""
+        if not self.visible:
+            return None
+
+        self.resized = False
+        if self.surface is None or self.frames_until_refresh <= 0:
+            last_size = self.surface.get_size() if self.surface is not None else None
+            self.surface = self.render_table()
+            self.resized = last_size is not None and self.surface.get_size() != last_size
+            self.frames_until_refresh = self.REFRESH_FRAMES
+        self.frames_until_refresh -= 1
+
+        return screen.blit(self.surface, self.POSITION)
+
+profiler_overlay = ProfilerOverlay()
@@ -0,0 +1,182 @@
+"""
+Deterministic input recording and replay, to reproduce a play session (and its frame times) exactly.
+
+    python replay.py session.replay --repeat 3 --profile profile.csv
+
+A recording holds the seed the random module was seeded with before the level was created, and the
+input the level saw on each frame: the keys it looked up that were held, stored only when they change,
+and the key events. Replaying seeds random the same way, starts the level headless and feeds the
+input back frame by frame, so every replay of a recording ends in the same world state.
+
+Record a session by setting settings.input_recording_path before starting rogue_gpt.py.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import pygame
+import headless
+from headless import InputScript
+from global_objects import globals
+from profiler import profiler
+
+RECORDED_EVENT_TYPES = (pygame.KEYDOWN, pygame.KEYUP)
+FORMAT_VERSION = 1
+
+class Recording:
+    def __init__(self, level, seed, frames, keys=None, events=None):
+        self.level = level  # Dotted path of the level class
+        self.seed = seed
+        self.frames = frames
+        self.keys = keys if keys is not None else []  # [frame, [keys held from that frame on]]
+        self.events = events if events is not None else []  # [frame, event type, key, mod]
+
+    def save(self, path):
+        """Write the recording as gzipped JSON."""
+        with gzip.open(path, 'wt') as file:
+            json.dump({'version': FORMAT_VERSION, 'level': self.level, 'seed': self.seed, 'frames': self.frames,
+                       'keys': self.keys, 'events': self.events}, file, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rt') as file:
+            data = json.load(file)
+
+        if data['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported recording version {data['version']} in {path}")
+
+        return cls(data['level'], data['seed'], data['frames'], data['keys'], data['events'])
+
+class RecordingKeys:
+    """Wraps the result of pygame.key.get_pressed() and remembers which of the keys looked up were held."""
+
+    def __init__(self, keys_pressed):
+        self.keys_pressed = keys_pressed
+        self.pressed = set()
+
+    def __getitem__(self, key):
+        pressed = self.keys_pressed[key]
+        if pressed:
+            self.pressed.add(key)
+        return pressed
+
+class InputRecorder:
+    """
+    Records the input of a level from its creation on.
+
+    Creating the recorder seeds the random module, so create it right before the level. Then pass every
+    frame's events and keys through record() and give the level what it returns.
+    """
+
+    def __init__(self, level_class, seed=None):
+        self.level = f"{level_class.__module__}.{level_class.__qualname__}"
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        random.seed(self.seed)
+
+        self.keys = []
+        self.events = []
+        self.frames = 0
+        self.last_pressed = []
+
+        # Keys of the frame being recorded, only known once the level has looked them up
+        self.current = None
+
+    def record(self, events, keys_pressed):
+        """Record the input of the next frame, returns the keys to hand to the level."""
+        self.finish_frame()
+
+        frame = globals.frame_count + 1
+        for event in events:
+            if event.type in RECORDED_EVENT_TYPES:
+                self.events.append([frame, event.type, event.key, event.mod])
+
+        self.frames = frame
+        self.current = RecordingKeys(keys_pressed)
+        return self.current
+
+    def finish_frame(self):
+        if self.current is None:
+            return
+
+        pressed = sorted(self.current.pressed)
+        if pressed != self.last_pressed:
+            self.keys.append([self.frames, pressed])
+            self.last_pressed = pressed
+        self.current = None
+
+    def recording(self):
+        self.finish_frame()
+        return Recording(self.level, self.seed, self.frames, list(self.keys), list(self.events))
+
+    def save(self, path):
+        self.recording().save(path)
+
+class ReplayInput(InputScript):
+    """The input of a recording, frame by frame, for headless.run."""
+
+    def __init__(self, recording):
+        super().__init__({frame: keys for frame, keys in recording.keys})
+
+        self.events = {}
+        for frame, event_type, key, mod in recording.events:
+            self.events.setdefault(frame, []).append(pygame.event.Event(event_type, key=key, mod=mod))
+
+    def events_for(self, frame):
+        return self.events.get(frame, [])
+
+def replay(recording, render=True, frames=None):
+    """
+    Replay a recording headless from a fresh world.
+
+    Args:
+        render (bool): Whether to draw every frame as the game does, to an off-screen surface.
+        frames (int): Frames to replay, all recorded frames by default.
+
+    Returns:
+        headless.RunResult of the replay.
+    """
+    level_class = headless.load_level_class(recording.level)
+    random.seed(recording.seed)
+    return headless.run(level_class, frames if frames is not None else recording.frames, ReplayInput(recording), render)
+
+def world_digest():
+    """Hash of the current world state (frame count and every registered object's state, in registration order)."""
+    digest = hashlib.sha1(str(globals.frame_count).encode())
+    for obj in globals.game_objects.values():
+        digest.update(type(obj).__name__.encode())
+        for value in obj.state():
+            digest.update(value if isinstance(value, bytes) else repr(value).encode())
+    return digest.hexdigest()
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded session headless and report its speed and end state.")
+    parser.add_argument('recording')
+    parser.add_argument('--frames', type=int, help="replay only the first N frames")
+    parser.add_argument('--no-render', action='store_true', help="only simulate, without drawing")
+    parser.add_argument('--repeat', type=int, default=1, help="replay N times and check every replay ends in the same state")
+    parser.add_argument('--profile', help="write per-frame phase timings of the last replay to this .csv or .jsonl file")
+    args = parser.parse_args()
+
+    recording = Recording.load(args.recording)
+    print(f"{recording.level}: seed {recording.seed}, {recording.frames} frames, "
+          f"{len(recording.keys)} key changes, {len(recording.events)} events")
+
+    if args.profile:
+        profiler.enable()
+
+    digests = []
+    for _ in range(args.repeat):
+        profiler.clear()
+        result = replay(recording, not args.no_render, args.frames)
+        digests.append(world_digest())
+        print(f"{result} state {digests[-1][:12]}")
+
+    if args.profile:
+        profiler.export(args.profile)
+
+    if len(set(digests)) > 1:
+        raise SystemExit("Replays ended in different states")
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,156 @@
+import os
+import pickle
 import pygame
 import sys
-import json
 
 from definitions import game_states
 from settings import settings
 from global_objects import globals
-from dummy_objects.dummy_level import DummyLevel
-from dummy_objects.particle_level import ParticleLevel
-from custom_event_level_test.level import CusomEventLevel
+from levels import level_registry
 from general_objects.main_menu import MainMenu
+from menu import fonts
 from camera import Camera
 from collision import CollisionGrid
+from scheduler import FrameScheduler
+from tracing import tracer
+from profiler import profiler
+from profiler_overlay import profiler_overlay
+import world_snapshot
 
-# Initialize Pygame
-pygame.init()
+# Levels, pipeline.py and replay.py are imported once needed, see benchmarks/startup.py for the
+# import-time budget of everything before the first menu frame
 
 # Game settings
 FPS = 60  # Frames per second
 FPS_THRESHOLD = 60  # Threshold to trigger FPS warning
+TRACE_DUMP_PATH = 'trace.jsonl'  # Where the trace buffer is written when F9 is pressed
+PROFILE_DUMP_PATH = 'profile.csv'  # Where per-frame phase timings are written when F10 is pressed (.csv or .jsonl)
+QUICKSAVE_PATH = 'quicksave.world'  # World snapshot saved with F5 and loaded with F6
 
-# Create the screen object
-screen = pygame.display.set_mode((settings.screen_width, settings.screen_height))
-pygame.display.set_caption("Pixelated Game with Enhanced Features")
+# Created by init()
+screen = None
+warning_text = None
+recorder = None  # Records the input of the level when settings.input_recording_path is set
+pipeline = None  # Worker process simulating the level when settings.pipelined_simulation is set
 
-# Font settings for FPS warning
-pygame.font.init()
-font = pygame.font.SysFont('Arial', 24)
-warning_text = font.render('Warning: FPS below 60!', True, (255, 0, 0))
 
-# Init global objects
-globals.current_level = CusomEventLevel(screen)
-globals.main_menu = MainMenu()
-globals.camera = Camera()
-globals.collision_grid = CollisionGrid()
+def init():
+    """Open the window and create the main menu, everything the first menu frame needs."""
+    global screen, warning_text
+
+    # Initialize Pygame
+    pygame.init()
+
+    # Create the screen object
+    screen = pygame.display.set_mode((settings.screen_width, settings.screen_height))
+    pygame.display.set_caption("Pixelated Game with Enhanced Features")
+
+    # Font settings for FPS warning
+    pygame.font.init()
+    font = fonts.get('Arial', 24)
+    warning_text = font.render('Warning: FPS below 60!', True, (255, 0, 0))
+
+    globals.main_menu = MainMenu(start_level)
+
+
+def start_level(name):
+    """Import, create and start the level picked in the menu, by name in levels.py."""
+    global recorder, pipeline
+
+    level_class = level_registry.load(name)
+
+    if settings.pipelined_simulation:
+        # The worker creates and runs the level, this process only draws the snapshots it sends
+        from pipeline import SimulationPipeline
+        globals.current_level = None
+        globals.camera = Camera()
+        new_pipeline = SimulationPipeline(level_class)
+        try:
+            new_pipeline.start()
+        except Exception:
+            new_pipeline.stop()  # Frees the shared memory of a worker that never got going
+            raise
+        pipeline = new_pipeline
+        return
+
+    if settings.input_recording_path:
+        from replay import InputRecorder
+        recorder = InputRecorder(level_class)  # Seeds random before the level is created
+
+    globals.current_level = level_class(screen)
+    globals.camera = Camera()
+    globals.collision_grid = CollisionGrid()
+    globals.scheduler = FrameScheduler()
+    globals.current_level.start()
+
+
+def request_full_redraw():
+    """Draw the whole level or menu on the next frame, after something drawn over it went away."""
+    if globals.game_state == game_states.RUNNING:
+        if globals.current_level is not None:  # Pipelined frames are always drawn whole
+            globals.current_level.request_full_redraw()
+    else:
+        globals.main_menu.get_menu().request_full_redraw()
+
+
+def load_quicksave():
+    """Continue the world saved with F5, the current level keeps running if there is no usable quicksave."""
+    if not os.path.exists(QUICKSAVE_PATH):
+        print(f"No quicksave to load, press F5 to save to {QUICKSAVE_PATH}")
+        return
+
+    try:
+        world_snapshot.load(QUICKSAVE_PATH, screen)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError) as e:
+        print(f"Could not load quicksave {QUICKSAVE_PATH}: {e!r}")
 
 
 def main():
+    init()
+
     clock = pygame.time.Clock()  # For controlling the frame rate
     running = True
+    warning_shown = False
 
     while running:
+        if profiler.enabled:
+            profiler.begin_frame()
+
         clock.tick(FPS)  # Ensure the game runs at the desired frame rate
+        if profiler.enabled:
+            profiler.mark('wait')
+
+        # Screen areas to push to the display, None for the whole screen
+        dirty_rects = None
 
         events = pygame.event.get()
 
         for event in events:
             if event.type == pygame.QUIT:  # Close the game window
                 running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                tracer.dump(TRACE_DUMP_PATH)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler_overlay.toggle()
+                request_full_redraw()  # Clear the overlay when only changed areas are drawn
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F10:
+                profiler.export(PROFILE_DUMP_PATH)
+            elif event.type == pygame.KEYDOWN and event.key in (pygame.K_F5, pygame.K_F6) and \
+                    globals.game_state == game_states.RUNNING and not settings.pipelined_simulation:
+                if event.key == pygame.K_F5:
+                    world_snapshot.save(QUICKSAVE_PATH)
+                else:
+                    load_quicksave()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4 and \
+                    globals.game_state == game_states.RUNNING and not settings.pipelined_simulation:
+                # Count the collision grid's work, shown in the profiler overlay
+                if globals.collision_grid.counters is None:
+                    globals.collision_grid.enable_counters()
+                else:
+                    globals.collision_grid.disable_counters()
+
+        if profiler.enabled:
+            profiler.mark('events')
 
         if globals.game_state == game_states.RUNNING:
             # Get the current state of the keyboard
@@ -57,25 +161,62 @@ def main():
             if keys_pressed[pygame.K_ESCAPE]:
                 running = False
 
-            globals.current_level.handle_frame(events, keys_pressed)
+            if pipeline is not None:
+                pipeline.step(keys_pressed, screen, events)
+            else:
+                if recorder is not None:
+                    keys_pressed = recorder.record(events, keys_pressed)
+                globals.current_level.handle_frame(events, keys_pressed)
+                dirty_rects = globals.current_level.dirty_rects
 
         elif globals.game_state == game_states.MAIN_MENU:
             for event in events:
                 globals.main_menu.get_menu().handle_event(event)
-            globals.main_menu.get_menu().draw(screen)
+            # The menu only draws the items that changed, so only those areas are pushed to the display
+            dirty_rects = globals.main_menu.get_menu().draw(screen)
+            if profiler.enabled:
+                profiler.mark('menu')
 
         # FPS Monitoring
         current_fps = clock.get_fps()
         if current_fps < FPS_THRESHOLD:
             # Render the warning text
-            screen.blit(warning_text, (10, 10))
+            warning_rect = screen.blit(warning_text, (10, 10))
+            if dirty_rects is not None:
+                dirty_rects.append(warning_rect)
+        elif warning_shown:
+            # Nothing else would clear the warning when only changed areas are drawn
+            request_full_redraw()
+        warning_shown = current_fps < FPS_THRESHOLD
+
+        overlay_rect = profiler_overlay.draw(screen)
+        if overlay_rect and dirty_rects is not None:
+            dirty_rects.append(overlay_rect)
+        if profiler_overlay.resized:
+            # A smaller table leaves the rest of the old one on screen until everything is drawn again
+            request_full_redraw()
+
+        if profiler.enabled:
+            profiler.mark('overlay')
 
         # Optional: Display current FPS for debugging (comment out if not needed)
         # fps_text = font.render(f'FPS: {int(current_fps)}', True, (255, 255, 255))
         # screen.blit(fps_text, (10, 40))
 
         # Update the display
-        pygame.display.flip()
+        if dirty_rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty_rects)
+
+        if profiler.enabled:
+            profiler.mark('flip')
+            profiler.end_frame()
+
+    if pipeline is not None:
+        pipeline.stop()
+    if recorder is not None:
+        recorder.save(settings.input_recording_path)
 
     pygame.quit()
     sys.exit()
@@ -0,0 +1,95 @@
+from global_objects import globals
+
+class FrameScheduler:
+    """
+    Decides which objects get on_frame called each frame.
+
+    Registered objects are awake by default. Sleeping parks an object in the timer wheel slot of the frame
+    it wakes on, so it costs nothing per frame until then: waking is one dict lookup per frame, and only
+    the objects whose sleep ends are touched.
+
+    Awake objects are handed out in registration order, like iterating globals.game_objects.
+    """
+
+    def __init__(self):
+        # Awake objects (dict used as an ordered set), kept in registration order
+        self.awake = {}
+
+        # Timer wheel: frame -> objects waking on that frame; entries of objects that were woken early or
+        # unregistered are skipped when their slot comes up
+        self.wheel = {}
+
+        # Parked object -> frame it wakes on (None until woken explicitly)
+        self.wake_frames = {}
+
+        self.awake_unsorted = False  # Objects were woken out of registration order
+
+    def add(self, obj):
+        if obj in self.wake_frames:
+            self.wake(obj)
+        else:
+            self.awake[obj] = None
+
+    def remove(self, obj):
+        self.awake.pop(obj, None)
+        self.wake_frames.pop(obj, None)
+
+    def sleep(self, obj, frames=None):
+        """
+        Stop calling obj.on_frame until `frames` frames from the current one have passed, or until woken
+        if frames is None.
+        """
+        if obj not in self.awake or (frames is not None and frames <= 0):
+            return  # Not registered, already parked, or nothing to wait for
+
+        del self.awake[obj]
+
+        wake_frame = globals.frame_count + frames if frames is not None else None
+        self.wake_frames[obj] = wake_frame
+        if wake_frame is not None:
+            self.wheel.setdefault(wake_frame, []).append(obj)
+
+    def wake(self, obj):
+        """Wake a parked object early, it runs again from the next frame's due_objects."""
+        if obj not in self.wake_frames:
+            return
+
+        del self.wake_frames[obj]
+        self.awake[obj] = None
+        self.awake_unsorted = True
+
+    def is_sleeping(self, obj):
+        return obj in self.wake_frames
+
+    def due_objects(self):
+        """Wake the objects whose sleep ends on the current frame and return every awake object."""
+        frame = globals.frame_count
+        for obj in self.wheel.pop(frame, ()):
+            if obj in self.wake_frames and self.wake_frames[obj] == frame:
+                del self.wake_frames[obj]
+                self.awake[obj] = None
+                self.awake_unsorted = True
+
+        if self.awake_unsorted:
+            # Woken objects were appended at the end; sorting the two ordered runs is close to linear
+            self.awake = dict.fromkeys(sorted(self.awake, key=lambda obj: obj.registration_order))
+            self.awake_unsorted = False
+
+        return list(self.awake)
+
+    def __getstate__(self):
+        # Snapshots (see world_snapshot.py) only keep the wheel entries still due, the stale entries of objects
+        # woken early, unregistered or recycled by a pool would be stored and restored for nothing
+        state = self.__dict__.copy()
+        state['wheel'] = {}
+        for frame, objects in self.wheel.items():
+            due = [obj for obj in dict.fromkeys(objects) if self.wake_frames.get(obj) == frame]
+            if due:
+                state['wheel'][frame] = due
+        return state
+
+    def clear(self):
+        self.awake.clear()
+        self.wheel.clear()
+        self.wake_frames.clear()
+        self.awake_unsorted = False
@@ -1,12 +1,39 @@
+from definitions import trace_levels, validation_modes
+
 class Settings:
     screen_width = 640
     screen_height = 480
 
     pixel_size = 10
 
+    # Redraw and push only the screen areas that changed, instead of the whole screen every frame
+    dirty_rect_rendering = False
+
     map_width = 128
     map_height = 96
 
+    collision_bucket_size = 8  # Side of a collision grid bucket, in game-world pixel units
+    collision_counters = False  # Count the collision grid's work (see CollisionGrid.enable_counters)
+
     player_speed = 1
 
+    start_level = 'custom_events'  # Level the menu's Play button starts, by name in levels.py
+
+    # Simulate the level in a worker process while the main process renders (see pipeline.py)
+    pipelined_simulation = False
+    pipeline_snapshot_capacity = 65536  # Draw rows per frame passed through shared memory, more are sent with the message
+
+    input_recording_path = None  # Record the seed and input of the game to this file, for replay.py (not in pipelined mode)
+
+    ability_validation = validation_modes.TRUSTED  # See custom_event_engine.parse_model, STRICT for abilities from untrusted sources
+    ability_cache_dir = None  # Directory of validated and compiled abilities, e.g. '.ability_cache' (see custom_event_engine/ability_cache.py)
+
+    object_pool_capacity = 10000  # Unregistered objects each pool keeps for reuse
+
+    trace_level = trace_levels.OFF
+    trace_capacity = 10000  # Records kept in the trace ring buffer
+
+    profiling = False  # Time the phases of every frame (see profiler.py)
+    profiler_capacity = 3600  # Frames of timings kept
+
 settings = Settings()
@@ -0,0 +1,97 @@
+import pygame
+from typing import List
+from settings import settings
+from square import Square
+
+def draw_object(surface, x, y, squares: List[Square]):
+    for square in squares:
+        if square.invisible:
+            continue
+
+        pygame.draw.rect(surface, square.color, (
+            (x + square.offset_x) * settings.pixel_size,  # Convert to raw screen pixels
+            (y + square.offset_y) * settings.pixel_size,
+            square.width * settings.pixel_size, square.height * settings.pixel_size))  # Scale width and height
+
+def squares_from_key(key):
+    """Rebuild a model's squares from its SpriteCache.model_key."""
+    return [Square(offset_x, offset_y, width, height, color, invisible)
+            for offset_x, offset_y, width, height, color, invisible in key]
+
+class Sprite:
+    def __init__(self, surface, offset_x, offset_y, key):
+        self.surface = surface  # The object's squares pre-rendered in raw screen pixels
+        self.offset_x = offset_x  # Top-left of the surface relative to the object, in game-world pixel units
+        self.offset_y = offset_y
+        self.key = key  # Model key the sprite was rendered from
+
+    def __reduce__(self):
+        # Pickled as its model key (surfaces cannot be pickled), unpickled as this process' sprite of the model
+        return load_sprite, (self.key,)
+
+class SpriteCache:
+    """
+    Pre-rendered surfaces for object models.
+
+    Models are keyed by the value of their squares, so every object with an identical model (for example
+    all objects spawned by one ability) shares a single surface.
+    """
+
+    COLORKEYS = [(255, 0, 255), (0, 255, 255), (255, 255, 0), (1, 2, 3)]
+
+    def __init__(self):
+        self.sprites = {}
+
+    def model_key(self, squares: List[Square]):
+        return tuple((square.offset_x, square.offset_y, square.width, square.height, tuple(square.color), square.invisible)
+                     for square in squares)
+
+    def get(self, squares: List[Square], key=None):
+        """Return the Sprite for a model, or None if nothing of it is visible."""
+        if key is None:
+            key = self.model_key(squares)
+
+        if key not in self.sprites:
+            self.sprites[key] = self.render(squares, key)
+
+        return self.sprites[key]
+
+    def render(self, squares: List[Square], key):
+        visible = [square for square in squares if not square.invisible and square.width > 0 and square.height > 0]
+        if not visible:
+            return None
+
+        left = min(square.offset_x for square in visible)
+        top = min(square.offset_y for square in visible)
+        right = max(square.offset_x + square.width for square in visible)
+        bottom = max(square.offset_y + square.height for square in visible)
+
+        surface = pygame.Surface(((right - left) * settings.pixel_size, (bottom - top) * settings.pixel_size))
+
+        covered = any(square.offset_x == left and square.offset_y == top and
+                      square.offset_x + square.width == right and square.offset_y + square.height == bottom
+                      for square in visible)
+        if covered:
+            # One square spans the whole model (e.g. a background), so the surface can be opaque
+            draw_object(surface, -left, -top, visible)
+        else:
+            # Colorkeyed surfaces blit much faster than per-pixel alpha, so pick a key color the model does not use
+            colors = {tuple(square.color) for square in visible}
+            colorkey = next(color for color in self.COLORKEYS if color not in colors)
+
+            surface.fill(colorkey)
+            draw_object(surface, -left, -top, visible)
+            surface.set_colorkey(colorkey, pygame.RLEACCEL)
+
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()  # Match the screen's pixel format
+
+        return Sprite(surface, left, top, key)
+
+    def clear(self):
+        self.sprites.clear()
+
+sprite_cache = SpriteCache()
+
+def load_sprite(key):
+    return sprite_cache.get(squares_from_key(key), key)
@@ -1,8 +1,33 @@
 class Square:
+    """
+    One colored rectangle of an object's model, relative to the object's position.
+
+    Squares use __slots__, so each costs about 90 bytes instead of about 140 with an instance dict. Squares
+    are never copied per instance: objects built from the same model share one list of squares.
+    """
+
+    __slots__ = ('offset_x', 'offset_y', 'width', 'height', 'color', 'invisible', 'version')
+
     def __init__(self, offset_x, offset_y, width, height, color, invisible=False):
-        self.offset_x = offset_x
-        self.offset_y = offset_y
-        self.width = width
-        self.height = height
-        self.color = color
-        self.invisible = invisible
\ No newline at end of file
+        # Set through object.__setattr__, creating a square is not a change to it
+        object.__setattr__(self, 'offset_x', offset_x)
+        object.__setattr__(self, 'offset_y', offset_y)
+        object.__setattr__(self, 'width', width)
+        object.__setattr__(self, 'height', height)
+        object.__setattr__(self, 'color', tuple(color))  # A tuple, so the color can only change by assignment
+        object.__setattr__(self, 'invisible', invisible)
+        object.__setattr__(self, 'version', 0)  # Bumped whenever the square is changed after creation
+
+    def __setattr__(self, name, value):
+        if name == 'color':
+            value = tuple(value)
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, 'version', self.version + 1)
+
+    def __reduce__(self):
+        # Pickled by value, unpickling must not go through __setattr__
+        return Square, (self.offset_x, self.offset_y, self.width, self.height, self.color, self.invisible)
+
+def model_version(squares):
+    """Changes whenever any square of a model is changed, so cached sprites know to re-check only their own model."""
+    return sum(square.version for square in squares)
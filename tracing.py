@@ -0,0 +1,47 @@
+import sys
+import json
+from collections import deque
+from settings import settings
+from global_objects import globals
+
+class Tracer:
+    """
+    Leveled trace of per-instance events, kept in a bounded in-memory ring buffer.
+
+    Call sites guard themselves with `if tracer.level >= trace_levels.X:` so a disabled level costs one
+    attribute comparison, and enabled levels never do I/O until the buffer is dumped.
+    """
+
+    def __init__(self, level=None, capacity=None):
+        self.level = level if level is not None else settings.trace_level
+        self.records = deque(maxlen=capacity if capacity else settings.trace_capacity)
+
+    def set_level(self, level, capacity=None):
+        self.level = level
+        if capacity and capacity != self.records.maxlen:
+            self.records = deque(self.records, maxlen=capacity)
+
+    def record(self, object_id, action_key, event, **values):
+        """Store one record, the oldest records are dropped once the buffer is full."""
+        self.records.append((globals.frame_count, object_id, action_key, event, values))
+
+    def clear(self):
+        self.records.clear()
+
+    def dump(self, file=None):
+        """Write the buffered records as JSON lines to a file object or path (stdout by default), oldest first."""
+        if isinstance(file, str):
+            with open(file, 'w') as f:
+                return self.dump(f)
+
+        file = file if file else sys.stdout
+        for frame, object_id, action_key, event, values in self.records:
+            file.write(json.dumps({
+                'frame': frame,
+                'object_id': object_id,
+                'action_key': action_key,
+                'event': event,
+                'values': values,
+            }, default=str) + '\n')
+
+tracer = Tracer()
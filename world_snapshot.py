@@ -0,0 +1,198 @@
+"""
+Binary snapshots of the whole world, for fast level restarts and checkpoints of long runs.
+
+    save('checkpoint.world')
+    level = load('checkpoint.world', screen)
+
+A snapshot holds the current level, every registered object, the camera, the scheduler, the frame count
+and the state of the random module, in one zlib-compressed pickle behind a small header.
+
+Registered objects are stored column-wise: for each class, one list per slot (x, y, squares, ...) and the
+instance dicts of the classes that have them, and the level, the scheduler and other objects refer to them
+by index. Loading creates the objects first and then fills in whole columns at once, without a per-object
+__setstate__. Entities kept in arrays (batched event objects, emitter particles) load in milliseconds,
+registered objects in about 10 us each (see benchmarks/snapshot.py). Things shared between objects
+(squares lists, programs, ...) are stored once, compiled programs as their description (see
+Program.__reduce__), sprites as their model key, and render state is left out (GameObject.CACHE_SLOTS,
+Level.RENDER_STATE). The scheduler leaves out the stale entries of its wheel (FrameScheduler.__getstate__).
+
+The collision grid is not stored: loading rebuilds it from the objects, in registration order, which
+gives the same buckets in the same order as the saved grid had.
+"""
+import io
+import itertools
+import pickle
+import random
+import struct
+import zlib
+from collections import deque
+from operator import attrgetter
+import numpy as np
+import pygame
+import game_object
+from game_object import GameObject
+from settings import settings
+from global_objects import globals
+from collision import CollisionGrid
+
+MAGIC = b'RGWS'
+VERSION = 1
+HEADER = struct.Struct('<4sBB')  # Magic, version, whether the payload is compressed
+
+def world_object(index):
+    """Stands in for a registered object in the pickle, resolved by WorldUnpickler to the loaded object."""
+    raise pickle.UnpicklingError("World objects can only be loaded with load_world")
+
+def slot_descriptors(cls):
+    """Slot name -> descriptor of every slot of cls, from base class to subclass."""
+    descriptors = {}
+    for klass in reversed(cls.__mro__):
+        for name in vars(klass).get('__slots__', ()):
+            descriptors[name] = vars(klass)[name]
+    return descriptors
+
+def saved_slots(cls):
+    return [name for name in slot_descriptors(cls) if name not in cls.CACHE_SLOTS]
+
+class WorldPickler(pickle.Pickler):
+    def __init__(self, file, objects):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.indices = {obj: index for index, obj in enumerate(objects)}
+
+    def reducer_override(self, obj):
+        # Registered objects are stored by index, anything else the usual way
+        if isinstance(obj, GameObject):
+            index = self.indices.get(obj)
+            if index is not None:
+                return world_object, (index,)
+        return NotImplemented
+
+class WorldUnpickler(pickle.Unpickler):
+    def __init__(self, file):
+        super().__init__(file)
+        self.objects = []
+
+    def find_class(self, module, name):
+        if module == __name__ and name == 'world_object':
+            return self.objects.__getitem__
+        return super().find_class(module, name)
+
+def save_world(compress=True):
+    """Return a snapshot of the current world as bytes."""
+    objects = list(globals.game_objects.values())
+
+    classes = list(dict.fromkeys(type(obj) for obj in objects))
+    class_indices = {cls: index for index, cls in enumerate(classes)}
+    object_classes = np.fromiter((class_indices[type(obj)] for obj in objects), dtype=np.int32, count=len(objects))
+
+    # Per class: (saved slot names, one list of values per slot, instance dicts or None)
+    columns = []
+    for index, cls in enumerate(classes):
+        instances = [objects[i] for i in np.flatnonzero(object_classes == index)]
+        names = saved_slots(cls)
+        values = [list(map(attrgetter(name), instances)) for name in names]
+        dicts = [instance.__dict__ for instance in instances] if hasattr(instances[0], '__dict__') else None
+        columns.append((names, values, dicts))
+
+    file = io.BytesIO()
+    pickler = WorldPickler(file, objects)
+
+    # The layout comes first, so loading can create every object before anything refers to one
+    pickler.dump((classes, object_classes))
+    pickler.dump({
+        'columns': columns,
+        'level': globals.current_level,
+        'camera': globals.camera,
+        'scheduler': globals.scheduler,
+        'frame_count': globals.frame_count,
+        'random': random.getstate(),
+        'next_id': next(game_object.id_counter),
+        'next_registration': next(game_object.registration_counter),
+    })
+
+    payload = file.getvalue()
+    if compress:
+        payload = zlib.compress(payload, 1)
+
+    return HEADER.pack(MAGIC, VERSION, compress) + payload
+
+def load_world(data, screen=None):
+    """
+    Replace the current world with a snapshot made by save_world.
+
+    Args:
+        screen: Surface the loaded level draws to, an off-screen surface by default.
+
+    Returns:
+        The loaded level, also set as globals.current_level.
+
+    Raises:
+        ValueError: If data is not a snapshot of this version or is damaged.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Not a world snapshot")
+    magic, version, compressed = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a world snapshot")
+    if version != VERSION:
+        raise ValueError(f"Unsupported world snapshot version {version}")
+
+    payload = memoryview(data)[HEADER.size:]
+    if compressed:
+        try:
+            payload = zlib.decompress(payload)
+        except zlib.error as e:
+            raise ValueError(f"Damaged world snapshot: {e}") from None
+    unpickler = WorldUnpickler(io.BytesIO(payload))
+
+    classes, object_classes = unpickler.load()
+    objects = unpickler.objects
+    objects.extend([None] * len(object_classes))
+    instances_by_class = []
+    for index, cls in enumerate(classes):
+        positions = np.flatnonzero(object_classes == index)
+        instances = list(map(cls.__new__, itertools.repeat(cls, len(positions))))
+        for position, instance in zip(positions.tolist(), instances):
+            objects[position] = instance
+        instances_by_class.append(instances)
+
+    state = unpickler.load()
+
+    # Fill in the objects a column at a time
+    for cls, instances, (names, values, dicts) in zip(classes, instances_by_class, state['columns']):
+        descriptors = slot_descriptors(cls)
+        for name, column in zip(names, values):
+            deque(map(descriptors[name].__set__, instances, column), maxlen=0)
+        for name, value in cls.CACHE_SLOTS.items():
+            deque(map(descriptors[name].__set__, instances, itertools.repeat(value)), maxlen=0)
+        if dicts is not None:
+            for instance, instance_dict in zip(instances, dicts):
+                instance.__dict__.update(instance_dict)
+
+    globals.game_objects.clear()
+    globals.game_objects.update((obj.id, obj) for obj in objects)
+    globals.camera = state['camera']
+    globals.scheduler = state['scheduler']
+    globals.frame_count = state['frame_count']
+    random.setstate(state['random'])
+
+    # Objects created from now on must not reuse ids or registration stamps of the loaded ones
+    game_object.id_counter = itertools.count(max(state['next_id'], next(game_object.id_counter)))
+    game_object.registration_counter = itertools.count(max(state['next_registration'], next(game_object.registration_counter)))
+
+    globals.collision_grid = CollisionGrid()
+    globals.collision_grid.register_all(objects)
+
+    level = state['level']
+    level.screen = screen if screen is not None else pygame.Surface((settings.screen_width, settings.screen_height))
+    level.bake_static_layer()
+    globals.current_level = level
+    return level
+
+def save(path, compress=True):
+    with open(path, 'wb') as file:
+        file.write(save_world(compress))
+
+def load(path, screen=None):
+    with open(path, 'rb') as file:
+        return load_world(file.read(), screen)